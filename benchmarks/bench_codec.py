@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import tarfile
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+
+from pyslp import creator, parse
+
+URL_COUNTS = [1, 10, 100, 1000, 5000]
+LANGUAGE_TAGS = ['en', 'ru-RU', 'zh-Hans-CN', 'язык']
+
+
+def url(i):
+    return 'service:bench://host-{:05d}.example.com:8080/path'.format(i)
+
+
+def attr_list(count):
+    return ','.join('(attr{}=value-{})'.format(i, i) for i in range(count))
+
+
+def with_language_tag(data, language_tag):
+    _, header_length = parse.parse_header(data)
+    body = data[header_length:]
+    header = creator.create_header(
+        function_id=data[1],
+        data_length=len(body),
+        ofr=data[5],
+        xid=parse.convert_to_int(data[10:12]),
+        language_tag=language_tag
+    )
+    return header + body
+
+
+def build_cases():
+    cases = list()
+
+    def encode(name, function, **kwargs):
+        function = getattr(creator, function, None)
+        if function is not None:
+            cases.append(('encode/' + name, lambda: function(**kwargs)))
+
+    def decode(name, function, data):
+        function = getattr(parse, function, None)
+        if function is not None and data is not None:
+            cases.append(('decode/' + name, lambda: function(data)))
+
+    def create(function, **kwargs):
+        function = getattr(creator, function, None)
+        return None if function is None else function(**kwargs)
+
+    for language_tag in LANGUAGE_TAGS:
+        encode('header/{}'.format(language_tag), 'create_header',
+               function_id=1, data_length=100, ofr=0, xid=1, language_tag=language_tag)
+        data = with_language_tag(create('create_request', service_type='service:bench'), language_tag)
+        decode('header/{}'.format(language_tag), 'parse_header', data)
+        decode('request/{}'.format(language_tag), 'parse_request', data)
+
+    registration = dict(
+        service_type='service:bench', scope_list='DEFAULT',
+        attr_list=attr_list(10), lifetime=300, url=url(0)
+    )
+    encode('registration', 'create_registration', **registration)
+    decode('registration', 'parse_registration', create('create_registration', **registration))
+    decode('encoded_registration', 'parse_encoded_registration', create('create_registration', **registration))
+
+    encode('deregistration', 'create_deregistration', url=url(0))
+    decode('deregistration', 'parse_deregistration', create('create_deregistration', url=url(0)))
+
+    encode('request', 'create_request', service_type='service:bench')
+    encode('acknowledge', 'create_acknowledge', xid=1)
+    decode('acknowledge', 'parse_acknowledge', create('create_acknowledge', xid=1))
+
+    for count in URL_COUNTS:
+        url_entries = [dict(url=url(i), lifetime=300) for i in range(count)]
+        encode('reply/{}'.format(count), 'create_reply', xid=1, url_entries=url_entries)
+        decode('reply/{}'.format(count), 'parse_reply', create('create_reply', xid=1, url_entries=url_entries))
+        encoded = [creator.create_url_entry(**url_entry) for url_entry in url_entries]
+        encode('encoded_reply/{}'.format(count), 'create_encoded_reply', xid=1, url_entries=encoded)
+
+    encode('attr_request', 'create_attr_request', url=url(0))
+    decode('attr_request', 'parse_attr_request', create('create_attr_request', url=url(0)))
+
+    for count in [1, 100, 1000]:
+        attrs = attr_list(count)
+        encode('attr_reply/{}'.format(count), 'create_attr_reply', xid=1, attr_list=attrs)
+        decode('attr_reply/{}'.format(count), 'parse_attr_reply', create('create_attr_reply', xid=1, attr_list=attrs))
+
+    service_types = ['service:bench-{}.vendor{}:x'.format(i, i % 10) for i in range(100)]
+    encode('srv_type_request', 'create_srv_type_request', naming_authority='vendor1')
+    decode('srv_type_request', 'parse_srv_type_request', create('create_srv_type_request', naming_authority='vendor1'))
+    encode('srv_type_reply/100', 'create_srv_type_reply', xid=1, service_types=service_types)
+    decode('srv_type_reply/100', 'parse_srv_type_reply',
+           create('create_srv_type_reply', xid=1, service_types=service_types))
+
+    da_advert = dict(url='service:directory-agent://127.0.0.1', boot_timestamp=1)
+    encode('da_advert', 'create_da_advert', **da_advert)
+    decode('da_advert', 'parse_da_advert', create('create_da_advert', **da_advert))
+
+    return cases
+
+
+def measure(function, min_time, repeat):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        number *= 10
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return dict(ops=number / best, peak_bytes=peak)
+
+
+def run(pattern, min_time, repeat):
+    results = dict()
+    for name, function in build_cases():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(function, min_time, repeat)
+    return results
+
+
+def print_results(results):
+    print('{:<32}{:>14}{:>12}{:>14}'.format('case', 'ops/s', 'us/op', 'peak bytes'))
+    for name, result in results.items():
+        print('{:<32}{:>14.0f}{:>12.2f}{:>14}'.format(
+            name, result['ops'], 1e6 / result['ops'], result['peak_bytes']
+        ))
+
+
+def print_comparison(old, new):
+    print('{:<32}{:>14}{:>14}{:>10}'.format('case', 'old ops/s', 'new ops/s', 'speedup'))
+    for name in new:
+        if name not in old:
+            continue
+        print('{:<32}{:>14.0f}{:>14.0f}{:>9.2f}x'.format(
+            name, old[name]['ops'], new[name]['ops'], new[name]['ops'] / old[name]['ops']
+        ))
+
+
+def run_revision(revision, args):
+    # runs this benchmark against the pyslp package of another git revision
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as path:
+        archive = os.path.join(path, 'pyslp.tar')
+        subprocess.check_call(['git', 'archive', '-o', archive, revision, 'pyslp'], cwd=root)
+        with tarfile.open(archive) as tar:
+            tar.extractall(path)
+        output = os.path.join(path, 'results.json')
+        command = [
+            sys.executable, os.path.abspath(__file__), '--save', output,
+            '--min-time', str(args.min_time), '--repeat', str(args.repeat), '--quiet'
+        ]
+        if args.filter:
+            command += ['--filter', args.filter]
+        subprocess.check_call(command, env=dict(os.environ, PYTHONPATH=path))
+        with open(output) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode/decode micro-benchmarks for pyslp.creator and pyslp.parse')
+    parser.add_argument('--filter', default='', help='only run cases containing this string')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per measurement')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved JSON results')
+    parser.add_argument('--against', metavar='REVISION', help='also run on a git revision and compare')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            print_comparison(json.load(old), json.load(new))
+        return
+
+    results = run(args.filter, args.min_time, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if not args.quiet:
+        print_results(results)
+
+    if args.against:
+        print()
+        print_comparison(run_revision(args.against, args), results)
+
+
+if __name__ == '__main__':
+    main()
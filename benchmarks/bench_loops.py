@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import argparse
+
+from pyslp import creator
+from pyslp.slpd import create_slpd
+
+
+class Client(asyncio.DatagramProtocol):
+
+    def __init__(self, data, addr, total, window, done):
+        self.data = data
+        self.addr = addr
+        self.total = total
+        self.window = window
+        self.done = done
+
+        self.transport = None
+        self.sent = 0
+        self.received = 0
+        self.progress = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for _ in range(min(self.window, self.total)):
+            self.send()
+
+    def send(self):
+        self.sent += 1
+        self.transport.sendto(self.data, self.addr)
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        if self.received >= self.total:
+            if not self.done.done():
+                self.done.set_result(self.received)
+        elif self.sent < self.total:
+            self.send()
+
+    def resend(self):
+        # replaces datagrams lost in the socket buffers, the window never drains otherwise
+        if self.received == self.progress:
+            for _ in range(min(self.window, self.total - self.received)):
+                self.transport.sendto(self.data, self.addr)
+        self.progress = self.received
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    slpd = await create_slpd(
+        args.ip_addr, mcast_port=args.port,
+        batch_size=args.batch_size, pktinfo=args.pktinfo
+    )
+    try:
+        slpd.register_many(
+            dict(service_type='service:bench', url='service:bench://host-{}'.format(i))
+            for i in range(args.urls)
+        )
+        data = creator.create_request(service_type='service:bench')
+        done = loop.create_future()
+        transport, client = await loop.create_datagram_endpoint(
+            lambda: Client(data, (args.ip_addr, args.port), args.requests, args.window, done),
+            local_addr=(args.ip_addr, 0)
+        )
+        start = time.perf_counter()
+        try:
+            while not done.done():
+                await asyncio.wait([done], timeout=0.5)
+                client.resend()
+        finally:
+            transport.close()
+        return args.requests, time.perf_counter() - start
+    finally:
+        slpd.close()
+
+
+def loop_factories():
+    factories = [('asyncio', asyncio.new_event_loop)]
+    try:
+        import uvloop
+    except ImportError:
+        print('uvloop is not installed, skipping it')
+    else:
+        factories.append(('uvloop', uvloop.new_event_loop))
+    return factories
+
+
+def main():
+    parser = argparse.ArgumentParser(description='slpd SrvRqst throughput on asyncio and uvloop')
+    parser.add_argument('--ip-addr', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4274)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=32)
+    parser.add_argument('--urls', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--pktinfo', action='store_true')
+    args = parser.parse_args()
+
+    print('{:<10}{:>10}{:>10}{:>12}'.format('loop', 'requests', 'seconds', 'req/s'))
+    for name, factory in loop_factories():
+        loop = factory()
+        try:
+            requests, seconds = loop.run_until_complete(run(args))
+        finally:
+            loop.close()
+        print('{:<10}{:>10}{:>10.2f}{:>12.0f}'.format(name, requests, seconds, requests / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+import time
+import random
+import asyncio
+import argparse
+
+from pyslp import creator, parse
+from pyslp.slpd import create_slpd
+
+KINDS = ('reg', 'rqst', 'attr', 'dereg')
+
+
+class Agent(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        self.transport = None
+        self.waiters = dict()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        waiter = self.waiters.pop(parse.convert_to_int(data[10:12]), None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(data)
+
+    async def request(self, data, addr, timeout):
+        xid = parse.convert_to_int(data[10:12])
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[xid] = waiter
+        self.transport.sendto(data, addr)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            self.waiters.pop(xid, None)
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = {kind: list() for kind in KINDS}
+        self.lost = {kind: 0 for kind in KINDS}
+
+    def report(self, seconds):
+        lines = ['{:<8}{:>10}{:>8}{:>10}{:>10}{:>10}'.format('kind', 'replies', 'lost', 'p50 ms', 'p99 ms', 'p999 ms')]
+        total = 0
+        for kind in KINDS:
+            latencies = sorted(self.latencies[kind])
+            total += len(latencies)
+            if not latencies and not self.lost[kind]:
+                continue
+            lines.append('{:<8}{:>10}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}'.format(
+                kind, len(latencies), self.lost[kind],
+                percentile(latencies, 0.5) * 1e3,
+                percentile(latencies, 0.99) * 1e3,
+                percentile(latencies, 0.999) * 1e3
+            ))
+        lost = sum(self.lost.values())
+        lines.append('throughput: {:.0f} replies/s, loss: {:.3%}'.format(
+            total / seconds, lost / max(1, total + lost)
+        ))
+        return '\n'.join(lines)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def parse_mix(mix):
+    weights = dict()
+    for item in mix.split(','):
+        kind, weight = item.split('=')
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError('unknown request kind: {}'.format(kind))
+        weights[kind] = float(weight)
+    return weights
+
+
+async def run_agent(number, args, addr, stats, deadline):
+    loop = asyncio.get_running_loop()
+    transport, agent = await loop.create_datagram_endpoint(Agent, local_addr=(args.ip_addr, 0))
+    rnd = random.Random(args.seed + number)
+    kinds = list(args.mix)
+    weights = [args.mix[kind] for kind in kinds]
+    urls = list()
+    counter = 0
+    try:
+        while time.monotonic() < deadline:
+            kind = rnd.choices(kinds, weights)[0]
+            if kind in ('attr', 'dereg') and not urls:
+                kind = 'reg'
+            service_type = 'service:load-{}'.format(rnd.randrange(args.types))
+
+            if kind == 'reg':
+                url = '{}://agent-{}-{}'.format(service_type, number, counter)
+                counter += 1
+                data = creator.create_registration(
+                    service_type=service_type, scope_list='DEFAULT',
+                    attr_list='(agent={})'.format(number), lifetime=args.lifetime, url=url
+                )
+                urls.append(url)
+            elif kind == 'rqst':
+                data = creator.create_request(service_type=service_type)
+            elif kind == 'attr':
+                data = creator.create_attr_request(url=rnd.choice(urls))
+            else:
+                data = creator.create_deregistration(url=urls.pop(rnd.randrange(len(urls))))
+
+            start = time.monotonic()
+            try:
+                await agent.request(data, addr, args.timeout)
+            except asyncio.TimeoutError:
+                stats.lost[kind] += 1
+            else:
+                stats.latencies[kind].append(time.monotonic() - start)
+    finally:
+        transport.close()
+
+
+async def run(args):
+    slpd = None
+    if args.target:
+        host, port = args.target.rsplit(':', 1)
+        addr = (host, int(port))
+    else:
+        slpd = await create_slpd(
+            args.ip_addr, mcast_port=args.port,
+            batch_size=args.batch_size, pktinfo=args.pktinfo
+        )
+        addr = (args.ip_addr, args.port)
+
+    try:
+        if slpd is not None and args.preload:
+            start = time.monotonic()
+            slpd.register_many(
+                dict(
+                    service_type='service:load-{}'.format(i % args.types),
+                    url='service:load-{}://preload-{}'.format(i % args.types, i),
+                    lifetime=args.preload_lifetime,
+                    attr_list='(preload={})'.format(i)
+                )
+                for i in range(args.preload)
+            )
+            print('preloaded {} registrations in {:.2f}s'.format(args.preload, time.monotonic() - start))
+
+        stats = Stats()
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*[run_agent(i, args, addr, stats, deadline) for i in range(args.agents)])
+        print(stats.report(time.monotonic() - start))
+
+        if slpd is not None:
+            snapshot = slpd.metrics.snapshot()
+            registrations = sum(
+                value for (name, _), value in snapshot['gauges'].items() if name == 'pyslp_slpd_registrations'
+            )
+            expired = sum(
+                value for (name, _), value in snapshot['counters'].items() if name == 'pyslp_slpd_expired_total'
+            )
+            print('registry: {} registrations, {} expired'.format(registrations, expired))
+    finally:
+        if slpd is not None:
+            slpd.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for slpd')
+    parser.add_argument('--ip-addr', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4275)
+    parser.add_argument('--target', help='HOST:PORT of a running slpd instead of an in-process one')
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('reg=1,rqst=4,attr=2,dereg=1'))
+    parser.add_argument('--types', type=int, default=50, help='number of service types')
+    parser.add_argument('--lifetime', type=int, default=5, help='lifetime of agent registrations')
+    parser.add_argument('--preload', type=int, default=0, help='registrations loaded before the run')
+    parser.add_argument('--preload-lifetime', type=int, default=65535)
+    parser.add_argument('--timeout', type=float, default=1)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--pktinfo', action='store_true')
+    parser.add_argument('--uvloop', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.uvloop:
+        import uvloop
+        loop = uvloop.new_event_loop()
+    else:
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run(args))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
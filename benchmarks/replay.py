@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+
+from pyslp import multicast, parse, pcap
+from pyslp.slpd import create_slpd
+from pyslp.loopback import LoopbackNetwork
+
+from benchmarks.loadgen import percentile
+
+PARSERS = {
+    1: parse.parse_request,
+    2: parse.parse_reply,
+    3: parse.parse_registration,
+    4: parse.parse_deregistration,
+    5: parse.parse_acknowledge,
+    6: parse.parse_attr_request,
+    7: parse.parse_attr_reply,
+    8: parse.parse_da_advert,
+    9: parse.parse_srv_type_request,
+    10: parse.parse_srv_type_reply,
+}
+REQUESTS = (1, 3, 4, 6, 9)
+
+
+class Summary:
+
+    def __init__(self):
+        self.functions = Counter()
+        self.service_types = Counter()
+        self.sizes = defaultdict(int)
+        self.errors = Counter()
+        self.first = None
+        self.last = None
+
+    def add(self, packet):
+        if packet.timestamp is not None:
+            self.first = packet.timestamp if self.first is None else self.first
+            self.last = packet.timestamp
+        try:
+            header, _ = parse.parse_header(packet.data)
+            function_id = header['function_id']
+            result = PARSERS[function_id](packet.data) if function_id in PARSERS else None
+        except (IndexError, ValueError, KeyError):
+            self.errors['decode'] += 1
+            return None
+        function = parse.FUNCTION_NAMES.get(function_id, str(function_id))
+        self.functions[function] += 1
+        self.sizes[function] += len(packet.data)
+        if function_id == 1:
+            self.service_types[result[1]['service_type']] += 1
+        return header
+
+    def report(self, top=10):
+        total = sum(self.functions.values())
+        lines = ['{:<16}{:>10}{:>9}{:>12}'.format('function', 'messages', 'share', 'avg bytes')]
+        for function, count in self.functions.most_common():
+            lines.append('{:<16}{:>10}{:>9.2%}{:>12.0f}'.format(
+                function, count, count / total, self.sizes[function] / count
+            ))
+        if self.errors:
+            lines.append('undecodable: {}'.format(sum(self.errors.values())))
+        if self.first is not None:
+            lines.append('capture duration: {:.3f}s'.format(self.last - self.first))
+        if self.service_types:
+            lines.append('top requested service types:')
+            for service_type, count in self.service_types.most_common(top):
+                lines.append('  {:<40}{:>10}'.format(service_type, count))
+        return '\n'.join(lines)
+
+
+class Source(asyncio.DatagramProtocol):
+    # replays the requests of one captured address; xids are renumbered so that
+    # retransmissions in the capture don't collide with each other
+
+    def __init__(self):
+        self.transport = None
+        self.waiters = dict()
+        self.xid = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        waiter = self.waiters.pop(parse.convert_to_int(data[10:12]), None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(data)
+
+    async def request(self, data, addr, timeout):
+        self.xid = xid = (self.xid + 1) & 0xFFFF
+        data = data[:10] + xid.to_bytes(2, 'big') + data[12:]
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[xid] = waiter
+        self.transport.sendto(data, addr)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            self.waiters.pop(xid, None)
+
+
+class Replay:
+
+    def __init__(self, network, ip_addr, addr, speed=1.0, timeout=1.0, sources=64):
+        self.network = network
+        self.ip_addr = ip_addr
+        self.addr = addr
+        self.speed = speed
+        self.timeout = timeout
+        self.max_sources = sources
+
+        self.sources = dict()
+        self.latencies = defaultdict(list)
+        self.lost = Counter()
+        self.tasks = set()
+
+    async def source(self, src):
+        # captured addresses share a bounded pool of sockets
+        key = hash(src) % self.max_sources
+        source = self.sources.get(key)
+        if source is None:
+            source = Source()
+            await self.network.create_sender(lambda: source, self.ip_addr, 0)
+            self.sources[key] = source
+        return source
+
+    async def send(self, source, function, data):
+        start = time.monotonic()
+        try:
+            await source.request(data, self.addr, self.timeout)
+        except asyncio.TimeoutError:
+            self.lost[function] += 1
+        else:
+            self.latencies[function].append(time.monotonic() - start)
+
+    async def run(self, packets, summary):
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        first = None
+        for packet in packets:
+            header = summary.add(packet)
+            if header is None or header['function_id'] not in REQUESTS:
+                continue
+            if packet.timestamp is not None and self.speed:
+                first = packet.timestamp if first is None else first
+                delay = start + (packet.timestamp - first) / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            source = await self.source(packet.src)
+            function = parse.FUNCTION_NAMES[header['function_id']]
+            task = loop.create_task(self.send(source, function, packet.data))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            await asyncio.sleep(0)
+        if self.tasks:
+            await asyncio.wait(list(self.tasks))
+        return time.monotonic() - start
+
+    def close(self):
+        for source in self.sources.values():
+            source.transport.close()
+
+    def report(self, seconds):
+        lines = ['{:<16}{:>10}{:>8}{:>10}{:>10}{:>10}'.format(
+            'function', 'replies', 'lost', 'p50 ms', 'p99 ms', 'p999 ms'
+        )]
+        total = 0
+        for function in sorted(set(self.latencies) | set(self.lost)):
+            latencies = sorted(self.latencies[function])
+            total += len(latencies)
+            lines.append('{:<16}{:>10}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}'.format(
+                function, len(latencies), self.lost[function],
+                percentile(latencies, 0.5) * 1e3,
+                percentile(latencies, 0.99) * 1e3,
+                percentile(latencies, 0.999) * 1e3
+            ))
+        lines.append('replayed in {:.3f}s, {:.0f} replies/s'.format(seconds, total / max(seconds, 1e-9)))
+        return '\n'.join(lines)
+
+
+async def run(args):
+    packets = pcap.open_packets(args.capture, ports=tuple(args.ports))
+    summary = Summary()
+    if args.summary_only:
+        for packet in packets:
+            summary.add(packet)
+        print(summary.report())
+        return
+
+    network = LoopbackNetwork() if args.loopback else multicast
+    slpd = None
+    if args.target:
+        host, port = args.target.rsplit(':', 1)
+        addr = (host, int(port))
+    else:
+        slpd = await create_slpd(args.ip_addr, mcast_port=args.port, scope=args.scope, network=network)
+        addr = (args.ip_addr, args.port)
+
+    replay = Replay(
+        network, args.client_addr or args.ip_addr, addr,
+        speed=args.speed, timeout=args.timeout, sources=args.sources
+    )
+    try:
+        seconds = await replay.run(packets, summary)
+        print(summary.report())
+        print()
+        print(replay.report(seconds))
+    finally:
+        replay.close()
+        if slpd is not None:
+            slpd.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay SLP traffic from a pcap/pcapng capture against slpd')
+    parser.add_argument('capture')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed relative to the capture, 0 sends as fast as possible')
+    parser.add_argument('--summary-only', action='store_true', help='only decode the capture')
+    parser.add_argument('--ports', type=int, nargs='+', default=[pcap.SLP_PORT])
+    parser.add_argument('--ip-addr', default='127.0.0.1')
+    parser.add_argument('--client-addr', help='address replayed requests are sent from')
+    parser.add_argument('--port', type=int, default=4276)
+    parser.add_argument('--scope', default='DEFAULT')
+    parser.add_argument('--target', help='HOST:PORT of a running slpd instead of an in-process one')
+    parser.add_argument('--loopback', action='store_true', help='replay over the in-memory loopback network')
+    parser.add_argument('--sources', type=int, default=64, help='sockets shared by the captured sources')
+    parser.add_argument('--timeout', type=float, default=1)
+    parser.add_argument('--uvloop', action='store_true')
+    args = parser.parse_args()
+
+    if args.uvloop:
+        import uvloop
+        loop = uvloop.new_event_loop()
+    else:
+        loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run(args))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
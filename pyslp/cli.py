@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import shlex
+import asyncio
+import inspect
+import argparse
+
+from pyslp import multicast
+from pyslp.slpd import create_slpd
+from pyslp.registry import Registry, EVICT_EXPIRY, EVICT_LRU
+from pyslp.slptool import SLPClient
+
+COMMANDS = ('register', 'deregister', 'findsrvs', 'findattrs', 'findsrvtypes')
+EVICTIONS = {EVICT_EXPIRY: EVICT_EXPIRY, EVICT_LRU: EVICT_LRU, 'none': None}
+
+
+def new_event_loop(use_uvloop):
+    if use_uvloop:
+        import uvloop
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def parse_limits(value):
+    limits = dict()
+    for item in value.split(','):
+        key, _, limit = item.partition('=')
+        key, limit = key.strip(), limit.strip()
+        if not limit:
+            raise argparse.ArgumentTypeError('expected KEY=VALUE: {}'.format(item))
+        if key not in inspect.signature(Registry).parameters:
+            raise argparse.ArgumentTypeError('unknown limit: {}'.format(key))
+        if key == 'eviction':
+            if limit not in EVICTIONS:
+                raise argparse.ArgumentTypeError('expected eviction={}: {}'.format('|'.join(EVICTIONS), limit))
+            limits[key] = EVICTIONS[limit]
+            continue
+        try:
+            limits[key] = int(limit)
+        except ValueError:
+            raise argparse.ArgumentTypeError('expected an integer: {}'.format(item))
+    return limits
+
+
+def parse_da_addr(value):
+    interface, _, da_addr = value.partition('=')
+    if not da_addr:
+        raise argparse.ArgumentTypeError('expected INTERFACE=DA: {}'.format(value))
+    return interface, da_addr
+
+
+def parse_addr(value):
+    host, _, port = value.rpartition(':')
+    if not host:
+        raise argparse.ArgumentTypeError('expected HOST:PORT: {}'.format(value))
+    return host, int(port)
+
+
+async def run_slpd(args):
+    from pyslp.metrics import create_metrics_server
+
+    slpd = await create_slpd(
+        args.ip_addrs or [], mcast_port=args.port, mcast_group=args.group, scope=args.scope, da=args.da,
+        batch_size=args.batch_size, pktinfo=args.pktinfo, limits=args.limits,
+        max_results=args.max_results, selection=args.selection
+    )
+    closers = [slpd.close]
+    if not args.ip_addrs:
+        from pyslp.interfaces import InterfaceWatcher
+        watcher = InterfaceWatcher(slpd, interval=args.interfaces_interval)
+        await watcher.start()
+        closers.insert(0, watcher.close)
+    if args.metrics:
+        server = await create_metrics_server(slpd.metrics, *args.metrics)
+        closers.insert(0, server.close)
+    if args.peers:
+        from pyslp.replication import create_replicator
+        replicator = await create_replicator(slpd, *args.replicate, peers=args.peers)
+        closers.insert(0, replicator.close)
+    return closers
+
+
+def slpd_main(argv=None):
+    parser = argparse.ArgumentParser(prog='pyslp-slpd', description='SLP daemon')
+    parser.add_argument('ip_addrs', nargs='*', help='interface addresses, all of them are watched if omitted')
+    parser.add_argument('--port', type=int, default=427)
+    parser.add_argument('--group', default='239.255.255.253')
+    parser.add_argument('--scope', default='DEFAULT')
+    parser.add_argument('--da', action='store_true', help='run as a Directory Agent')
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--pktinfo', action='store_true')
+    parser.add_argument('--limits', type=parse_limits, default=None,
+                        help='registry limits, e.g. max_entries=100000,eviction=lru (expiry, lru or none)')
+    parser.add_argument('--max-results', type=int, default=None)
+    parser.add_argument('--selection', choices=['random', 'round-robin', 'weighted'], default=None)
+    parser.add_argument('--metrics', type=parse_addr, help='HOST:PORT to serve Prometheus metrics on')
+    parser.add_argument('--replicate', type=parse_addr, help='HOST:PORT to exchange changes with peers on')
+    parser.add_argument('--peer', dest='peers', type=parse_addr, action='append', default=[])
+    parser.add_argument('--interfaces-interval', type=float, default=None)
+    parser.add_argument('--uvloop', action='store_true')
+    args = parser.parse_args(argv)
+    if args.peers and not args.replicate:
+        parser.error('--peer needs --replicate')
+
+    loop = new_event_loop(args.uvloop)
+    closers = list()
+    try:
+        closers = loop.run_until_complete(run_slpd(args))
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for close in closers:
+            close()
+        loop.close()
+
+
+def parse_command(line):
+    # a JSON object with a command key and the SLPClient keyword arguments, or shell-like words
+    line = line.strip()
+    if line.startswith('{'):
+        command = json.loads(line)
+        if not isinstance(command, dict) or command.get('command') not in COMMANDS:
+            raise ValueError('unknown command')
+        return command
+
+    words = shlex.split(line)
+    name, args = words[0], words[1:]
+    names = dict(
+        register=('service_type', 'url', 'attr_list', 'lifetime'),
+        deregister=('url',),
+        findsrvs=('service_type',),
+        findattrs=('url',),
+        findsrvtypes=('naming_authority',)
+    )
+    if name not in names:
+        raise ValueError('unknown command: {}'.format(name))
+    required = 2 if name == 'register' else (0 if name == 'findsrvtypes' else 1)
+    if not required <= len(args) <= len(names[name]):
+        raise ValueError('wrong number of arguments for {}'.format(name))
+    command = dict(zip(names[name], args), command=name)
+    if 'lifetime' in command:
+        command['lifetime'] = int(command['lifetime'])
+    return command
+
+
+async def execute(slp_client, command):
+    kwargs = {key: value for key, value in command.items() if key not in ('command', 'id')}
+    name = command['command']
+    result = await getattr(slp_client, name)(**kwargs)
+    if name == 'findsrvs':
+        return dict(urls=result[0], addrs=result[1])
+    if name == 'findsrvtypes':
+        return dict(service_types=result[0], addrs=result[1])
+    if name == 'findattrs':
+        return dict(attr_list=result or '')
+    return None
+
+
+async def run_batch(slp_client, lines, output, concurrency=64, loop=None):
+    # one JSON line per command in completion order, returns the number of failed ones
+    loop = loop or asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    failed = 0
+
+    def emit(record):
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+
+    async def run(number, line):
+        nonlocal failed
+        record = dict(id=number)
+        try:
+            command = parse_command(line)
+            record.update(id=command.get('id', number), command=command['command'])
+            record['result'] = await execute(slp_client, command)
+        except Exception as e:
+            failed += 1
+            record['error'] = str(e) or type(e).__name__
+        finally:
+            semaphore.release()
+        emit(record)
+
+    number = 0
+    iterator = iter(lines)
+    while True:
+        # the next line is read off the loop, so a slow stdin does not hold up running commands
+        line = await loop.run_in_executor(None, next, iterator, None)
+        if line is None:
+            break
+        number += 1
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        await semaphore.acquire()
+        task = asyncio.ensure_future(run(number, line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    return failed
+
+
+def tool_main(argv=None):
+    parser = argparse.ArgumentParser(prog='pyslp-tool', description='SLP user and service agent tool')
+    parser.add_argument('--ip-addr', dest='ip_addrs', action='append', default=[],
+                        help='interface address to send from (repeatable, default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=427)
+    parser.add_argument('--group', default='239.255.255.253')
+    parser.add_argument('--scope', default='DEFAULT')
+    parser.add_argument('--timeout', type=float, default=1)
+    parser.add_argument('--da', dest='da_addrs', type=parse_da_addr, action='append', default=[],
+                        metavar='INTERFACE=DA', help='send to a Directory Agent by unicast (repeatable)')
+    parser.add_argument('--uvloop', action='store_true')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    register = subparsers.add_parser('register')
+    register.add_argument('service_type')
+    register.add_argument('url')
+    register.add_argument('--attr-list', default='')
+    register.add_argument('--lifetime', type=int, default=65535)
+    subparsers.add_parser('deregister').add_argument('url')
+    subparsers.add_parser('findsrvs').add_argument('service_type')
+    subparsers.add_parser('findattrs').add_argument('url')
+    subparsers.add_parser('findsrvtypes').add_argument('naming_authority', nargs='?')
+    batch = subparsers.add_parser('batch', help='run commands from a file or stdin, one JSON line per result')
+    batch.add_argument('file', nargs='?', default='-')
+    batch.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args(argv)
+
+    loop = new_event_loop(args.uvloop)
+    slp_client = SLPClient(
+        args.ip_addrs or ['127.0.0.1'], mcast_group=args.group, mcast_port=args.port, scope=args.scope,
+        da_addrs=dict(args.da_addrs), network=multicast, timeout=args.timeout, reuse_sockets=True
+    )
+    try:
+        if args.command == 'batch':
+            lines = sys.stdin if args.file == '-' else open(args.file)
+            try:
+                failed = loop.run_until_complete(
+                    run_batch(slp_client, lines, sys.stdout, concurrency=args.concurrency)
+                )
+            finally:
+                if lines is not sys.stdin:
+                    lines.close()
+            return 1 if failed else 0
+
+        command = {key: value for key, value in vars(args).items() if key in (
+            'service_type', 'url', 'attr_list', 'lifetime', 'naming_authority'
+        )}
+        command['command'] = args.command
+        try:
+            result = loop.run_until_complete(execute(slp_client, command))
+        except Exception as e:
+            print(json.dumps(dict(command=args.command, error=str(e) or type(e).__name__)))
+            return 1
+        print(json.dumps(dict(command=args.command, result=result)))
+        return 0
+    finally:
+        slp_client.close()
+        loop.close()
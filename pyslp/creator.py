@@ -44,10 +44,15 @@ def create_url_entry(lifetime, url):
 
 
 def create_reply(xid, url_entries, error_code=0):
-    data = error_code.to_bytes(length=2, byteorder='big')
-    data += len(url_entries).to_bytes(length=2, byteorder='big')
-    for entry in url_entries:
-        data += create_url_entry(**entry)
+    return create_encoded_reply(xid, [create_url_entry(**entry) for entry in url_entries], error_code)
+
+
+def create_encoded_reply(xid, url_entries, error_code=0):
+    # url_entries are already encoded URL entries, e.g. the ones a Registry keeps
+    data = b''.join([
+        error_code.to_bytes(length=2, byteorder='big'),
+        len(url_entries).to_bytes(length=2, byteorder='big')
+    ] + url_entries)
     header = create_header(function_id=2, data_length=len(data), xid=xid, ofr=0)
     return header + data
 
@@ -66,9 +71,9 @@ def create_registration(service_type, scope_list, attr_list, lifetime, url):
     return header + data
 
 
-def create_request(service_type, scope_list='DEFAULT'):
+def create_request(service_type, scope_list='DEFAULT', pr_list=''):
     data = b''
-    for value in ['', service_type, scope_list, '', '']:
+    for value in [pr_list, service_type, scope_list, '', '']:
         value_length = len(value.encode()).to_bytes(length=2, byteorder='big')
         data += value_length
         data += value.encode()
@@ -77,9 +82,9 @@ def create_request(service_type, scope_list='DEFAULT'):
     return header + data
 
 
-def create_attr_request(url, scope_list='DEFAULT'):
+def create_attr_request(url, scope_list='DEFAULT', pr_list=''):
     data = b''
-    for value in ['', url, scope_list, '', '']:
+    for value in [pr_list, url, scope_list, '', '']:
         value_length = len(value.encode()).to_bytes(length=2, byteorder='big')
         data += value_length
         data += value.encode()
@@ -88,16 +93,42 @@ def create_attr_request(url, scope_list='DEFAULT'):
     return header + data
 
 
+def set_pr_list(data, pr_list):
+    # the PRList is the first field of SrvRqst, AttrRqst and SrvTypeRqst
+    header_length = 14 + (data[12] << 8 | data[13])
+    p = header_length + 2 + (data[header_length] << 8 | data[header_length + 1])
+    pr_list = pr_list.encode()
+    body = len(pr_list).to_bytes(length=2, byteorder='big') + pr_list + data[p:]
+    length = (header_length + len(body)).to_bytes(3, byteorder='big')
+    return data[:2] + length + data[5:header_length] + body
+
+
 def create_attr_reply(xid, attr_list, error_code=0):
+    # attr_list is a str or the already encoded attribute list
+    if isinstance(attr_list, str):
+        attr_list = attr_list.encode()
     data = error_code.to_bytes(length=2, byteorder='big')
     data += len(attr_list).to_bytes(length=2, byteorder='big')
-    data += attr_list.encode()
+    data += attr_list
     data += bytes([0])
 
     header = create_header(function_id=7, data_length=len(data), xid=xid, ofr=0)
     return header + data
 
 
+def create_error_reply(function_id, xid, error_code):
+    # the reply message type each request is answered with, RFC 2608 section 7
+    if function_id == 1:
+        return create_reply(xid=xid, url_entries=[], error_code=error_code)
+    if function_id in (3, 4):
+        return create_acknowledge(xid=xid, error_code=error_code)
+    if function_id == 6:
+        return create_attr_reply(xid=xid, attr_list='', error_code=error_code)
+    if function_id == 9:
+        return create_srv_type_reply(xid=xid, service_types=[], error_code=error_code)
+    return None
+
+
 def create_deregistration(url, scope_list='DEFAULT'):
     data = b''
     for value in [scope_list]:
@@ -111,3 +142,44 @@ def create_deregistration(url, scope_list='DEFAULT'):
 
     header = create_header(function_id=4, data_length=len(data), ofr=0)
     return header + data
+
+
+def create_da_advert(url, scope_list='DEFAULT', attr_list='', boot_timestamp=0, xid=0, error_code=0):
+    data = error_code.to_bytes(length=2, byteorder='big')
+    data += boot_timestamp.to_bytes(length=4, byteorder='big')
+
+    for value in [url, scope_list, attr_list, '']:
+        value_length = len(value.encode()).to_bytes(length=2, byteorder='big')
+        data += value_length
+        data += value.encode()
+
+    data += bytes([0])
+
+    header = create_header(function_id=8, data_length=len(data), xid=xid, ofr=0)
+    return header + data
+
+
+def create_srv_type_request(naming_authority=None, scope_list='DEFAULT', pr_list=''):
+    # naming_authority None asks for all naming authorities, '' for IANA only
+    data = len(pr_list.encode()).to_bytes(length=2, byteorder='big')
+    data += pr_list.encode()
+    if naming_authority is None:
+        data += (0xFFFF).to_bytes(length=2, byteorder='big')
+    else:
+        data += len(naming_authority.encode()).to_bytes(length=2, byteorder='big')
+        data += naming_authority.encode()
+    data += len(scope_list.encode()).to_bytes(length=2, byteorder='big')
+    data += scope_list.encode()
+
+    header = create_header(function_id=9, data_length=len(data), ofr=64)
+    return header + data
+
+
+def create_srv_type_reply(xid, service_types, error_code=0):
+    service_types = ','.join(service_types).encode()
+    data = error_code.to_bytes(length=2, byteorder='big')
+    data += len(service_types).to_bytes(length=2, byteorder='big')
+    data += service_types
+
+    header = create_header(function_id=10, data_length=len(data), xid=xid, ofr=0)
+    return header + data
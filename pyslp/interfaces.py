@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import struct
+import asyncio
+
+NETLINK_ROUTE = 0
+RTMGRP_IPV4_IFADDR = 0x10
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+NLMSGHDR = struct.Struct('=IHHII')
+IFADDRMSG = struct.Struct('=BBBBI')
+RTATTR = struct.Struct('=HH')
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def parse_netlink_addrs(data):
+    addrs = list()
+    done = False
+    p = 0
+    while p + NLMSGHDR.size <= len(data):
+        length, msg_type, flags, seq, pid = NLMSGHDR.unpack_from(data, p)
+        if length < NLMSGHDR.size:
+            break
+        if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+            done = True
+            break
+        if msg_type in (RTM_NEWADDR, RTM_DELADDR):
+            family = IFADDRMSG.unpack_from(data, p + NLMSGHDR.size)[0]
+            q = p + NLMSGHDR.size + IFADDRMSG.size
+            addr = None
+            while family == socket.AF_INET and q + RTATTR.size <= p + length:
+                rta_len, rta_type = RTATTR.unpack_from(data, q)
+                if rta_len < RTATTR.size:
+                    break
+                if rta_type in (IFA_ADDRESS, IFA_LOCAL) and rta_len == RTATTR.size + 4:
+                    if rta_type == IFA_LOCAL or addr is None:
+                        addr = socket.inet_ntoa(data[q + RTATTR.size:q + RTATTR.size + 4])
+                q += _align(rta_len)
+            if addr is not None:
+                addrs.append((msg_type, addr))
+        p += _align(length)
+    return addrs, done
+
+
+def get_ip_addrs():
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        sock.send(
+            NLMSGHDR.pack(NLMSGHDR.size + IFADDRMSG.size, RTM_GETADDR, NLM_F_REQUEST | NLM_F_DUMP, 1, 0) +
+            IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+        )
+        ip_addrs = list()
+        done = False
+        while not done:
+            addrs, done = parse_netlink_addrs(sock.recv(65536))
+            ip_addrs.extend(addr for msg_type, addr in addrs if addr not in ip_addrs)
+        return ip_addrs
+    finally:
+        sock.close()
+
+
+class InterfaceWatcher:
+
+    def __init__(self, slpd, get_ip_addrs=get_ip_addrs, interval=None, netlink=True, loop=None):
+        self.slpd = slpd
+        self.get_ip_addrs = get_ip_addrs
+        self.netlink = netlink and hasattr(socket, 'AF_NETLINK')
+        self.interval = interval
+        if self.interval is None and not self.netlink:
+            self.interval = 30
+        self.loop = loop
+
+        self.sock = None
+        self.handle = None
+        self.task = None
+        self.pending = False
+        self.ip_addrs = None
+
+    async def start(self):
+        self.loop = self.loop or asyncio.get_running_loop()
+        if self.netlink:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            self.sock.setblocking(False)
+            self.sock.bind((0, RTMGRP_IPV4_IFADDR))
+            self.loop.add_reader(self.sock.fileno(), self.netlink_ready)
+        if self.interval:
+            self.handle = self.loop.call_later(self.interval, self.interval_expired)
+        await self.check()
+
+    def netlink_ready(self):
+        while True:
+            try:
+                self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+        self.check()
+
+    def interval_expired(self):
+        self.handle = self.loop.call_later(self.interval, self.interval_expired)
+        self.check()
+
+    def check(self):
+        if self.task is not None and not self.task.done():
+            self.pending = True
+        else:
+            self.task = self.loop.create_task(self.sync())
+        return self.task
+
+    async def sync(self):
+        self.pending = True
+        while self.pending:
+            self.pending = False
+            ip_addrs = sorted(set(self.get_ip_addrs()))
+            if ip_addrs != self.ip_addrs:
+                await self.slpd.update(ip_addrs)
+                self.ip_addrs = ip_addrs
+
+    def close(self):
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
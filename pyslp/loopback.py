@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+import random
+import asyncio
+
+
+class LoopbackTransport(asyncio.DatagramTransport):
+
+    def __init__(self, network, protocol, sockname, interface=None, group=None):
+        super().__init__()
+        self.network = network
+        self.protocol = protocol
+        self.sockname = sockname
+        self.interface = interface
+        self.group = group
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        if name == 'sockname':
+            return self.sockname
+        return default
+
+    def get_protocol(self):
+        return self.protocol
+
+    def is_closing(self):
+        return self.closed
+
+    def sendto(self, data, addr=None):
+        if self.closed:
+            return
+        self.network.send(self, bytes(data), addr)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.network.unbind(self)
+        self.network.loop.call_soon(self.protocol.connection_lost, None)
+
+    def abort(self):
+        self.close()
+
+
+class CallbackProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.callback(data, addr, self.transport)
+
+
+class LoopbackPktInfoTransport:
+    # PktInfoTransport on top of one group listener per interface
+
+    def __init__(self, network, callback, port, group):
+        self.network = network
+        self.callback = callback
+        self.port = port
+        self.group = group
+        self.interfaces = dict()
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        if name == 'sockname':
+            return ('0.0.0.0', self.port)
+        return default
+
+    def is_closing(self):
+        return self.closed
+
+    def add_interface(self, ip_addr):
+        if ip_addr not in self.interfaces:
+            callback = lambda data, addr, transport: self.callback(data, addr, ip_addr, transport)
+            self.interfaces[ip_addr] = self.network._bind(
+                lambda: CallbackProtocol(callback), ('0.0.0.0', self.port), interface=ip_addr, group=self.group
+            )
+        return self.interfaces[ip_addr]
+
+    def remove_interface(self, ip_addr):
+        transport = self.interfaces.pop(ip_addr, None)
+        if transport is not None:
+            transport.close()
+
+    def close(self):
+        self.closed = True
+        for ip_addr in list(self.interfaces):
+            self.remove_interface(ip_addr)
+
+
+class LoopbackNetwork:
+    # in-memory datagram network with the coroutine API of pyslp.multicast
+
+    def __init__(self, latency=0, jitter=0, loss=0, reorder=0, seed=None, loop=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.random = random.Random(seed)
+        self.loop = loop
+
+        self.endpoints = dict()
+        self.listeners = dict()
+        self.groups = dict()
+        self.next_port = 49152
+
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+        # datagrams scheduled for delivery that have not arrived yet
+        self.in_flight = 0
+
+    def _bind(self, protocol_factory, sockname, interface=None, group=None):
+        self.loop = self.loop or asyncio.get_running_loop()
+        if sockname[1] == 0:
+            while (sockname[0], self.next_port) in self.endpoints:
+                self.next_port += 1
+            sockname = (sockname[0], self.next_port)
+            self.next_port += 1
+
+        protocol = protocol_factory()
+        transport = LoopbackTransport(self, protocol, sockname, interface, group)
+        if group is not None:
+            self.groups.setdefault((group, sockname[1]), list()).append(transport)
+            self.listeners.setdefault((interface, sockname[1]), list()).append(transport)
+        else:
+            if sockname in self.endpoints:
+                raise OSError('Address already in use: {}'.format(sockname))
+            self.endpoints[sockname] = transport
+        protocol.connection_made(transport)
+        return transport
+
+    def unbind(self, transport):
+        if transport.group is None:
+            self.endpoints.pop(transport.sockname, None)
+            return
+        for key, table in [((transport.group, transport.sockname[1]), self.groups),
+                           ((transport.interface, transport.sockname[1]), self.listeners)]:
+            transports = table.get(key, [])
+            if transport in transports:
+                transports.remove(transport)
+            if not transports:
+                table.pop(key, None)
+
+    def send(self, transport, data, addr):
+        self.sent += 1
+        if addr in self.endpoints:
+            receivers = [self.endpoints[addr]]
+        else:
+            receivers = self.listeners.get(addr, []) or self.groups.get(addr, [])
+
+        # like the kernel, a listener bound to the wildcard address sends from its interface
+        source = transport.sockname
+        if transport.interface is not None:
+            source = (transport.interface, source[1])
+
+        for receiver in list(receivers):
+            if self.loss and self.random.random() < self.loss:
+                self.dropped += 1
+                continue
+            delay = self.latency
+            if self.jitter:
+                delay += self.random.uniform(0, self.jitter)
+            if self.reorder and self.random.random() < self.reorder:
+                delay += self.random.uniform(0, 2 * (self.latency + self.jitter) or 0.001)
+            self.in_flight += 1
+            if delay:
+                self.loop.call_later(delay, self.deliver, receiver, data, source)
+            else:
+                self.loop.call_soon(self.deliver, receiver, data, source)
+
+    def deliver(self, receiver, data, addr):
+        self.in_flight -= 1
+        if receiver.closed:
+            self.dropped += 1
+            return
+        self.delivered += 1
+        receiver.protocol.datagram_received(data, addr)
+
+    async def settle(self, interval=0.001):
+        # returns once every datagram sent, replies included, has been delivered or dropped
+        while self.in_flight:
+            await asyncio.sleep(interval)
+
+    async def create_listener(self, protocol_factory, ip_addr, port, group, loop=None):
+        return self._bind(protocol_factory, ('0.0.0.0', port), interface=ip_addr, group=group)
+
+    async def create_unicast_listener(self, protocol_factory, ip_addr, port, loop=None):
+        return self._bind(protocol_factory, (ip_addr, port))
+
+    async def create_batch_listener(self, callback, ip_addr, port, group=None, loop=None, batch_size=64):
+        if group is None:
+            return await self.create_unicast_listener(lambda: CallbackProtocol(callback), ip_addr, port)
+        return await self.create_listener(lambda: CallbackProtocol(callback), ip_addr, port, group)
+
+    async def create_sender(self, protocol_factory, ip_addr, port, loop=None):
+        return self._bind(protocol_factory, (ip_addr, port))
+
+    async def create_pktinfo_listener(self, callback, ip_addrs, port, group, loop=None, batch_size=64):
+        self.loop = self.loop or asyncio.get_running_loop()
+        transport = LoopbackPktInfoTransport(self, callback, port, group)
+        for ip_addr in ip_addrs or []:
+            transport.add_interface(ip_addr)
+        return transport
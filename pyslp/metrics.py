@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import asyncio
+
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels
+    ) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        result = list()
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = dict()
+        self.gauges = dict()
+        self.histograms = dict()
+        self.collectors = list()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    def get(self, name, **labels):
+        key = _key(name, labels)
+        if key in self.counters:
+            return self.counters[key]
+        if key in self.gauges:
+            return self.gauges[key]
+        return self.histograms.get(key)
+
+    def snapshot(self):
+        self.collect()
+        return dict(
+            counters={key: value for key, value in self.counters.items()},
+            gauges={key: value for key, value in self.gauges.items()},
+            histograms={
+                key: dict(
+                    buckets=histogram.cumulative(),
+                    sum=histogram.sum,
+                    count=histogram.count
+                )
+                for key, histogram in self.histograms.items()
+            }
+        )
+
+    def render(self):
+        self.collect()
+        lines = list()
+        for metric_type, values in [('counter', self.counters), ('gauge', self.gauges)]:
+            previous = None
+            for (name, labels), value in sorted(values.items()):
+                if name != previous:
+                    lines.append('# TYPE {} {}'.format(name, metric_type))
+                    previous = name
+                lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+
+        previous = None
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name != previous:
+                lines.append('# TYPE {} histogram'.format(name))
+                previous = name
+            for bound, count in histogram.cumulative():
+                lines.append('{}_bucket{} {}'.format(
+                    name, _format_labels(labels, [('le', _format_value(bound))]), count
+                ))
+            lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _format_value(histogram.sum)))
+            lines.append('{}_count{} {}'.format(name, _format_labels(labels), histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+
+async def create_metrics_server(metrics, ip_addr='127.0.0.1', port=9427):
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status = '200 OK'
+                body = metrics.render().encode()
+            else:
+                status = '404 Not Found'
+                body = b'Not Found\n'
+
+            writer.write(
+                'HTTP/1.0 {}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {}\r\n\r\n'.format(
+                    status, len(body)
+                ).encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return (await asyncio.start_server(handle, ip_addr, port))
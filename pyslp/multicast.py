@@ -1,17 +1,23 @@
 # -*- coding: utf-8 -*-
 
+import errno
 import socket
 import struct
 import asyncio
+from collections import deque, Counter
 
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)
+IN_PKTINFO = struct.Struct('I4s4s')
+# a full socket or interface queue costs one reply, which the client retransmits
+TRANSIENT_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS)
 
-@asyncio.coroutine
-def create_listener(protocol_factory, ip_addr, port, group, loop=None):
-    loop = loop or asyncio.get_event_loop()
+
+async def create_listener(protocol_factory, ip_addr, port, group, loop=None):
+    loop = loop or asyncio.get_running_loop()
     sock = socket.socket(type=socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.bind(('', port))
-    transport, protocol = yield from loop.create_datagram_endpoint(protocol_factory, sock=sock)
+    transport, protocol = await loop.create_datagram_endpoint(protocol_factory, sock=sock)
 
     mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(ip_addr))
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
@@ -19,14 +25,28 @@ def create_listener(protocol_factory, ip_addr, port, group, loop=None):
     return transport
 
 
-@asyncio.coroutine
-def create_sender(protocol_factory, ip_addr, port, loop=None):
-    loop = loop or asyncio.get_event_loop()
+async def create_unicast_listener(protocol_factory, ip_addr, port, loop=None):
+    loop = loop or asyncio.get_running_loop()
     sock = socket.socket(type=socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.bind((ip_addr, port))
 
     try:
-        transport, protocol = yield from loop.create_datagram_endpoint(protocol_factory, sock=sock)
+        transport, protocol = await loop.create_datagram_endpoint(protocol_factory, sock=sock)
+    except:
+        sock.close()
+        raise
+
+    return transport
+
+
+async def create_sender(protocol_factory, ip_addr, port, loop=None):
+    loop = loop or asyncio.get_running_loop()
+    sock = socket.socket(type=socket.SOCK_DGRAM)
+    sock.bind((ip_addr, port))
+
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(protocol_factory, sock=sock)
     except:
         sock.close()
         raise
@@ -39,3 +59,228 @@ def create_sender(protocol_factory, ip_addr, port, loop=None):
         raise
 
     return transport
+
+
+class BatchTransport:
+
+    def __init__(self, sock, callback, loop, batch_size=64, bufsize=65535):
+        self.sock = sock
+        self.callback = callback
+        self.loop = loop
+        self.batch_size = batch_size
+        self.bufsize = bufsize
+
+        self.pending = deque()
+        self.writing = False
+        self.closed = False
+        # replies lost to other send errors, by errno name
+        self.send_errors = Counter()
+
+        self.sock.setblocking(False)
+        self.loop.add_reader(self.sock.fileno(), self._read_ready)
+
+    def get_extra_info(self, name, default=None):
+        if name == 'socket':
+            return self.sock
+        if name == 'sockname':
+            return self.sock.getsockname()
+        return default
+
+    def _recv_batch(self):
+        batch = list()
+        for _ in range(self.batch_size):
+            try:
+                batch.append(self.sock.recvfrom(self.bufsize))
+            except (BlockingIOError, InterruptedError):
+                break
+        return batch
+
+    def _read_ready(self):
+        try:
+            for data, addr in self._recv_batch():
+                self.callback(data, addr, self)
+        finally:
+            self.flush()
+
+    def _send(self, data, addr):
+        self.sock.sendto(data, addr)
+
+    def _write_ready(self):
+        self.flush()
+
+    def sendto(self, data, addr):
+        self.pending.append((data, addr))
+
+    def flush(self):
+        while self.pending and not self.closed:
+            try:
+                self._send(*self.pending[0])
+            except (BlockingIOError, InterruptedError):
+                if not self.writing:
+                    self.loop.add_writer(self.sock.fileno(), self._write_ready)
+                    self.writing = True
+                return
+            except OSError as e:
+                if e.errno not in TRANSIENT_ERRORS:
+                    self.send_errors[errno.errorcode.get(e.errno, str(e.errno))] += 1
+            self.pending.popleft()
+
+        if self.writing:
+            self.loop.remove_writer(self.sock.fileno())
+            self.writing = False
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.loop.remove_reader(self.sock.fileno())
+        if self.writing:
+            self.loop.remove_writer(self.sock.fileno())
+            self.writing = False
+        self.pending.clear()
+        self.sock.close()
+
+
+async def create_batch_listener(callback, ip_addr, port, group=None, loop=None, batch_size=64):
+    loop = loop or asyncio.get_running_loop()
+    sock = socket.socket(type=socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if group is None:
+            sock.bind((ip_addr, port))
+        else:
+            sock.bind(('', port))
+            mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(ip_addr))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    except:
+        sock.close()
+        raise
+
+    return BatchTransport(sock, callback, loop, batch_size=batch_size)
+
+
+class InterfaceTransport:
+
+    def __init__(self, transport, ip_addr):
+        self.transport = transport
+        self.ip_addr = ip_addr
+
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+
+    def sendto(self, data, addr):
+        self.transport.sendto(data, addr, self.ip_addr)
+
+    def close(self):
+        self.transport.remove_interface(self.ip_addr)
+
+
+class PktInfoTransport(BatchTransport):
+
+    def __init__(self, sock, callback, loop, group, batch_size=64, bufsize=65535):
+        super().__init__(sock, callback, loop, batch_size=batch_size, bufsize=bufsize)
+        self.group = group
+        self.interfaces = dict()
+        self.memberships = set()
+        self.ifindexes = dict()
+        self.dropped = 0
+        self.ancbufsize = socket.CMSG_SPACE(IN_PKTINFO.size)
+
+    def _membership(self, option, ip_addr):
+        mreq = struct.pack("4s4s", socket.inet_aton(self.group), socket.inet_aton(ip_addr))
+        self.sock.setsockopt(socket.IPPROTO_IP, option, mreq)
+
+    def _join(self, ip_addr):
+        try:
+            self._membership(socket.IP_ADD_MEMBERSHIP, ip_addr)
+        except OSError as e:
+            # the group is already joined on the link this address belongs to
+            if e.errno != errno.EADDRINUSE:
+                raise
+            return
+        self.memberships.add(ip_addr)
+
+    def add_interface(self, ip_addr):
+        if ip_addr not in self.interfaces:
+            self._join(ip_addr)
+            self.interfaces[ip_addr] = InterfaceTransport(self, ip_addr)
+        return self.interfaces[ip_addr]
+
+    def remove_interface(self, ip_addr):
+        if self.interfaces.pop(ip_addr, None) is None:
+            return
+        for ifindex in [i for i, addr in self.ifindexes.items() if addr == ip_addr]:
+            self.ifindexes.pop(ifindex)
+        if self.closed or ip_addr not in self.memberships:
+            return
+        self.memberships.discard(ip_addr)
+        self._membership(socket.IP_DROP_MEMBERSHIP, ip_addr)
+        for other in set(self.interfaces) - self.memberships:
+            self._join(other)
+
+    def _recv_batch(self):
+        batch = list()
+        for _ in range(self.batch_size):
+            try:
+                data, ancdata, flags, addr = self.sock.recvmsg(self.bufsize, self.ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                break
+            ifindex = spec_dst = dst = None
+            for level, cmsg_type, cmsg_data in ancdata:
+                if level == socket.IPPROTO_IP and cmsg_type == IP_PKTINFO:
+                    ifindex, spec_dst, dst = IN_PKTINFO.unpack_from(cmsg_data)
+                    spec_dst = socket.inet_ntoa(spec_dst)
+                    dst = socket.inet_ntoa(dst)
+            batch.append((data, addr, self.resolve(ifindex, spec_dst, dst)))
+        return batch
+
+    def resolve(self, ifindex, spec_dst, dst):
+        for ip_addr in [spec_dst, dst]:
+            if ip_addr in self.interfaces:
+                if ifindex is not None:
+                    self.ifindexes[ifindex] = ip_addr
+                return ip_addr
+        return self.ifindexes.get(ifindex)
+
+    def _read_ready(self):
+        try:
+            for data, addr, ip_addr in self._recv_batch():
+                if ip_addr is None:
+                    self.dropped += 1
+                    continue
+                self.callback(data, addr, ip_addr, self.interfaces[ip_addr])
+        finally:
+            self.flush()
+
+    def _send(self, data, addr, ip_addr=None):
+        if ip_addr is None:
+            self.sock.sendto(data, addr)
+            return
+        pktinfo = IN_PKTINFO.pack(0, socket.inet_aton(ip_addr), bytes(4))
+        self.sock.sendmsg([data], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, addr)
+
+    def sendto(self, data, addr, ip_addr=None):
+        self.pending.append((data, addr, ip_addr))
+
+
+async def create_pktinfo_listener(callback, ip_addrs, port, group, loop=None, batch_size=64):
+    loop = loop or asyncio.get_running_loop()
+    sock = socket.socket(type=socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        sock.bind(('', port))
+    except:
+        sock.close()
+        raise
+
+    transport = PktInfoTransport(sock, callback, loop, group, batch_size=batch_size)
+    try:
+        for ip_addr in ip_addrs or []:
+            transport.add_interface(ip_addr)
+    except:
+        transport.close()
+        raise
+
+    return transport
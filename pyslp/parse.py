@@ -1,125 +1,301 @@
 # -*- coding: utf-8 -*-
 
+FUNCTION_NAMES = {
+    1: 'SrvRqst',
+    2: 'SrvRply',
+    3: 'SrvReg',
+    4: 'SrvDeReg',
+    5: 'SrvAck',
+    6: 'AttrRqst',
+    7: 'AttrRply',
+    8: 'DAAdvert',
+    9: 'SrvTypeRqst',
+    10: 'SrvTypeRply',
+    11: 'SAAdvert'
+}
+
+# error codes, RFC 2608 section 7
+LANGUAGE_NOT_SUPPORTED = 1
+PARSE_ERROR = 2
+INVALID_REGISTRATION = 3
+SCOPE_NOT_SUPPORTED = 4
+AUTHENTICATION_UNKNOWN = 5
+AUTHENTICATION_ABSENT = 6
+AUTHENTICATION_FAILED = 7
+VER_NOT_SUPPORTED = 9
+INTERNAL_ERROR = 10
+DA_BUSY_NOW = 11
+OPTION_NOT_UNDERSTOOD = 12
+INVALID_UPDATE = 13
+MSG_NOT_SUPPORTED = 14
+REFRESH_REJECTED = 15
+
+VERSION = 2
+HEADER_LENGTH = 14
+
+FLAG_OVERFLOW = 0x80
+FLAG_FRESH = 0x40
+FLAG_MCAST = 0x20
+
+# naming authority length of a SrvTypeRqst asking for every naming authority
+ALL_NAMING_AUTHORITIES = 0xFFFF
+
+
+class ParseError(ValueError):
+
+    def __init__(self, error_code=PARSE_ERROR, message='Malformed SLP message'):
+        super().__init__(message)
+        self.error_code = error_code
+
 
 def convert_to_int(data):
     return int.from_bytes(data, byteorder='big')
 
 
-def _parse(data, count):
-    p = 0
+def check_header(data):
+    # only fixed-offset fields are looked at, so garbage is rejected before any decoding
+    size = len(data)
+    if size < HEADER_LENGTH:
+        return PARSE_ERROR
+    if data[0] != VERSION:
+        return VER_NOT_SUPPORTED
+    if data[1] not in FUNCTION_NAMES:
+        return MSG_NOT_SUPPORTED
+    if (data[2] << 16 | data[3] << 8 | data[4]) != size:
+        return PARSE_ERROR
+    header_length = HEADER_LENGTH + (data[12] << 8 | data[13])
+    if header_length > size:
+        return PARSE_ERROR
+    next_ext_offset = data[7] << 16 | data[8] << 8 | data[9]
+    if next_ext_offset and (next_ext_offset < header_length or next_ext_offset + 5 > size):
+        return PARSE_ERROR
+    return 0
+
+
+def _decode(value):
+    try:
+        return value.decode()
+    except UnicodeDecodeError:
+        raise ParseError() from None
+
+
+def _string(data, p, end):
+    if p + 2 > end:
+        raise ParseError()
+    q = p + 2 + (data[p] << 8 | data[p + 1])
+    if q > end:
+        raise ParseError()
+    return data[p + 2:q], q
+
+
+def _parse(data, count, p=0, end=None):
+    end = len(data) if end is None else end
     result = list()
     for _ in range(count):
-        length = convert_to_int(data[p:p + 2])
-        p += 2
-        value = data[p:p + length]
+        value, p = _string(data, p, end)
+        result.append(value)
+    return result, p
+
+
+def _skip_auth_blocks(data, p, end):
+    if p + 1 > end:
+        raise ParseError()
+    count = data[p]
+    p += 1
+    for _ in range(count):
+        if p + 4 > end:
+            raise ParseError()
+        length = data[p + 2] << 8 | data[p + 3]
+        if length < 4 or p + length > end:
+            raise ParseError()
         p += length
-        result.append(
-            dict(
-                value=value,
-                length=length
-            )
-        )
+    return p
 
-    return [info['value'] for info in result], 7 + sum([info['length'] for info in result])
+
+def _parse_url_entry(data, p, end):
+    if p + 6 > end:
+        raise ParseError()
+    lifetime = data[p + 1] << 8 | data[p + 2]
+    url, p = _string(data, p + 3, end)
+    p = _skip_auth_blocks(data, p, end)
+    return dict(
+        lifetime=lifetime,
+        url=_decode(url)
+    ), p
 
 
 def parse_header(data):
-    language_tag_length = convert_to_int(data[12:14])
-    header_length = 14 + language_tag_length
+    error_code = check_header(data)
+    if error_code:
+        raise ParseError(error_code)
+    language_tag_length = data[12] << 8 | data[13]
+    header_length = HEADER_LENGTH + language_tag_length
     return dict(
         version=data[0],
         function_id=data[1],
-        length=convert_to_int(data[2:5]),
-        xid=convert_to_int(data[10:12]),
+        length=len(data),
+        xid=data[10] << 8 | data[11],
         language_tag_length=language_tag_length,
-        language_tag=data[14:header_length].decode()
+        language_tag=_decode(data[HEADER_LENGTH:header_length])
     ), header_length
 
 
+def _header(data, parsed):
+    # the (header, header_length) pair of a caller that has run parse_header already
+    return parse_header(data) if parsed is None else parsed
+
+
 def parse_url_entry(data):
-    url_length = convert_to_int(data[3:5])
-    auth_length = data[5 + url_length]
-    length = 6 + url_length + auth_length
-    return dict(
-        lifetime=convert_to_int(data[1:3]),
-        url=data[5:5 + url_length].decode()
-    ), length
+    return _parse_url_entry(data, 0, len(data))
 
 
-def parse_registration(data):
-    header, header_length = parse_header(data)
-    url_entry, url_entries_length = parse_url_entry(data[header_length:])
+def parse_registration(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
+    url_entry, p = _parse_url_entry(data, header_length, end)
 
-    result, length = _parse(data[header_length + url_entries_length:], 3)
+    result, p = _parse(data, 3, p, end)
 
     return header, url_entry, dict(
-        service_type=result[0].decode(),
-        scope_list=result[1].decode(),
-        attr_list=result[2].decode()
+        service_type=_decode(result[0]),
+        scope_list=_decode(result[1]),
+        attr_list=_decode(result[2])
     )
 
 
-def parse_request(data):
-    header, header_length = parse_header(data)
-    result, length = _parse(data[header_length:], 5)
+def parse_encoded_registration(data, parsed=None):
+    # the URL entry as sent, without authentication blocks, and the attribute list checked to be UTF-8
+    header, header_length = _header(data, parsed)
+    end = len(data)
+    url_entry, p = _parse_url_entry(data, header_length, end)
+    url_end = header_length + 5 + (data[header_length + 3] << 8 | data[header_length + 4])
+    if data[url_end]:
+        encoded_url_entry = data[header_length:url_end] + b'\x00'
+    else:
+        encoded_url_entry = data[header_length:url_end + 1]
+
+    result, p = _parse(data, 3, p, end)
+    attr_list = result[2]
+    if not attr_list.isascii():
+        _decode(attr_list)
+
+    return header, url_entry, encoded_url_entry, dict(
+        service_type=_decode(result[0]),
+        scope_list=_decode(result[1]),
+        attr_list=attr_list
+    )
+
+
+def parse_request(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    result, p = _parse(data, 5, header_length)
     return header, dict(
-        service_type=result[1].decode(),
-        scope_list=result[2].decode()
+        service_type=_decode(result[1]),
+        scope_list=_decode(result[2]),
+        pr_list=_decode(result[0])
     )
 
 
-def parse_reply(data):
-    header, header_length = parse_header(data)
+def parse_reply(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
     p = header_length
-    error_code = convert_to_int(data[p:p + 2])
-    p += 2
-    url_count = convert_to_int(data[p:p + 2])
-    p += 2
+    if p + 4 > end:
+        raise ParseError()
+    error_code = data[p] << 8 | data[p + 1]
+    url_count = data[p + 2] << 8 | data[p + 3]
+    p += 4
+    # every URL entry takes at least six bytes
+    if p + 6 * url_count > end:
+        raise ParseError()
     url_entries = list()
     for _ in range(url_count):
-        url_entry, url_entry_length = parse_url_entry(data[p:])
+        url_entry, p = _parse_url_entry(data, p, end)
         url_entries.append(url_entry)
-        p += url_entry_length
     return header, error_code, url_entries
 
 
-def parse_acknowledge(data):
-    header, header_length = parse_header(data)
-    error_code = convert_to_int(data[header_length:header_length + 2])
+def parse_acknowledge(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    if header_length + 2 > len(data):
+        raise ParseError()
+    error_code = data[header_length] << 8 | data[header_length + 1]
     return header, error_code
 
 
-def parse_attr_request(data):
-    header, header_length = parse_header(data)
-    result, length = _parse(data[header_length:], 5)
+def parse_attr_request(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    result, p = _parse(data, 5, header_length)
     return header, dict(
-        url=result[1].decode(),
-        scope_list=result[2].decode()
+        url=_decode(result[1]),
+        scope_list=_decode(result[2]),
+        pr_list=_decode(result[0])
     )
 
 
-def parse_attr_reply(data):
-    header, header_length = parse_header(data)
+def parse_attr_reply(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
+    p = header_length
+    if p + 2 > end:
+        raise ParseError()
+    error_code = data[p] << 8 | data[p + 1]
+    attr_list, p = _string(data, p + 2, end)
+    return header, error_code, _decode(attr_list)
+
+
+def parse_deregistration(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
+    scope_list, p = _string(data, header_length, end)
+    url_entry, p = _parse_url_entry(data, p, end)
+    tag_list, p = _string(data, p, end)
+    return header, url_entry, _decode(scope_list)
+
+
+def parse_da_advert(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
     p = header_length
-    error_code = convert_to_int(data[p:p + 2])
-    p += 2
-    attr_list_length = convert_to_int(data[p:p + 2])
-    p += 2
-    attr_list = data[p:p + attr_list_length].decode()
-    p += attr_list_length
-    return header, error_code, attr_list
+    if p + 6 > end:
+        raise ParseError()
+    error_code = data[p] << 8 | data[p + 1]
+    boot_timestamp = convert_to_int(data[p + 2:p + 6])
+    result, p = _parse(data, 3, p + 6, end)
+    return header, error_code, dict(
+        boot_timestamp=boot_timestamp,
+        url=_decode(result[0]),
+        scope_list=_decode(result[1]),
+        attr_list=_decode(result[2])
+    )
+
+
+def parse_srv_type_request(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
+    pr_list, p = _string(data, header_length, end)
+    if p + 2 > end:
+        raise ParseError()
+    if data[p] << 8 | data[p + 1] == ALL_NAMING_AUTHORITIES:
+        naming_authority, p = None, p + 2
+    else:
+        naming_authority, p = _string(data, p, end)
+        naming_authority = _decode(naming_authority)
+    scope_list, p = _string(data, p, end)
+    return header, dict(
+        naming_authority=naming_authority,
+        scope_list=_decode(scope_list),
+        pr_list=_decode(pr_list)
+    )
 
 
-def parse_deregistration(data):
-    header, header_length = parse_header(data)
+def parse_srv_type_reply(data, parsed=None):
+    header, header_length = _header(data, parsed)
+    end = len(data)
     p = header_length
-    scope_list_length = convert_to_int(data[p:p + 2])
-    p += 2
-    scope_list = data[p:p + scope_list_length].decode()
-    p += scope_list_length
-    url_entry, url_entry_length = parse_url_entry(data[p:])
-    p += url_entry_length
-    tag_list_length = convert_to_int(data[p:p + 2])
-    p += 2
-    tag_list = data[p:]
-    return header, url_entry, scope_list
+    if p + 2 > end:
+        raise ParseError()
+    error_code = data[p] << 8 | data[p + 1]
+    service_types, p = _string(data, p + 2, end)
+    service_types = _decode(service_types)
+    return header, error_code, service_types.split(',') if service_types else []
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import struct
+from collections import namedtuple
+
+SLP_PORT = 427
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_SHB = b'\x0a\x0d\x0d\x0a'
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+BLOCK_IDB = 1
+BLOCK_SPB = 3
+BLOCK_EPB = 6
+OPTION_IF_TSRESOL = 9
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+IPPROTO_UDP = 17
+
+Packet = namedtuple('Packet', 'timestamp src dst data')
+
+
+class PcapError(Exception):
+    pass
+
+
+def _read(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        if data:
+            raise PcapError('Truncated capture')
+        return None
+    return data
+
+
+def read_pcap_frames(f, magic):
+    endian, resolution = PCAP_MAGIC[magic]
+    header = _read(f, 20)
+    if header is None:
+        raise PcapError('Truncated capture')
+    linktype = struct.unpack(endian + 'I', header[16:20])[0] & 0xFFFF
+    record = struct.Struct(endian + 'IIII')
+    while True:
+        data = _read(f, record.size)
+        if data is None:
+            return
+        ts_sec, ts_frac, incl_len, _ = record.unpack(data)
+        frame = _read(f, incl_len)
+        if frame is None:
+            raise PcapError('Truncated capture')
+        yield ts_sec + ts_frac * resolution, linktype, frame
+
+
+def _tsresol(options, endian):
+    p = 0
+    while p + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, p)
+        if code == 0:
+            break
+        if code == OPTION_IF_TSRESOL and length >= 1:
+            value = options[p + 4]
+            if value & 0x80:
+                return 2.0 ** -(value & 0x7F)
+            return 10.0 ** -value
+        p += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+def read_pcapng_frames(f, block_type):
+    interfaces = list()
+    endian = '<'
+    while block_type is not None:
+        data = _read(f, 4)
+        if block_type == PCAPNG_SHB:
+            byte_order = _read(f, 4)
+            if data is None or byte_order is None:
+                raise PcapError('Truncated capture')
+            endian = '<' if struct.unpack('<I', byte_order)[0] == PCAPNG_BYTE_ORDER else '>'
+            interfaces = list()
+            length = struct.unpack(endian + 'I', data)[0]
+            body = _read(f, length - 12) if length >= 16 else None
+        else:
+            length = struct.unpack(endian + 'I', data)[0] if data is not None else 0
+            body = _read(f, length - 8) if length >= 12 else None
+        if body is None:
+            raise PcapError('Truncated capture')
+
+        if block_type != PCAPNG_SHB:
+            block_type_id = struct.unpack(endian + 'I', block_type)[0]
+            if block_type_id == BLOCK_IDB:
+                linktype = struct.unpack_from(endian + 'H', body)[0]
+                interfaces.append((linktype, _tsresol(body[8:-4], endian)))
+            elif block_type_id == BLOCK_EPB:
+                interface_id, ts_high, ts_low, captured = struct.unpack_from(endian + 'IIII', body)
+                linktype, resolution = interfaces[interface_id]
+                yield ((ts_high << 32) | ts_low) * resolution, linktype, body[20:20 + captured]
+            elif block_type_id == BLOCK_SPB and interfaces:
+                yield None, interfaces[0][0], body[4:-4]
+
+        block_type = _read(f, 4)
+
+
+def read_frames(f):
+    # (timestamp, linktype, frame) from a pcap or pcapng stream
+    magic = _read(f, 4)
+    if magic is None:
+        return
+    if magic in PCAP_MAGIC:
+        yield from read_pcap_frames(f, magic)
+    elif magic == PCAPNG_SHB:
+        yield from read_pcapng_frames(f, magic)
+    else:
+        raise PcapError('Unknown capture format')
+
+
+def decode_link(linktype, frame):
+    if linktype == LINKTYPE_ETHERNET:
+        ethertype, p = struct.unpack_from('!H', frame, 12)[0], 14
+        while ethertype in ETHERTYPE_VLAN:
+            ethertype, p = struct.unpack_from('!H', frame, p + 2)[0], p + 4
+        return ethertype, frame[p:]
+    if linktype == LINKTYPE_LINUX_SLL:
+        return struct.unpack_from('!H', frame, 14)[0], frame[16:]
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return struct.unpack_from('!H', frame, 0)[0], frame[20:]
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        frame = frame[4:]
+    elif linktype not in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        return None, None
+    version = frame[0] >> 4 if frame else 0
+    return {4: ETHERTYPE_IPV4, 6: ETHERTYPE_IPV6}.get(version), frame
+
+
+def decode_udp(ethertype, packet):
+    if ethertype == ETHERTYPE_IPV4:
+        header_length = (packet[0] & 0x0F) * 4
+        fragment = struct.unpack_from('!H', packet, 6)[0]
+        if packet[9] != IPPROTO_UDP or fragment & 0x3FFF:
+            return None
+        src, dst = socket.inet_ntoa(packet[12:16]), socket.inet_ntoa(packet[16:20])
+    elif ethertype == ETHERTYPE_IPV6:
+        header_length = 40
+        if packet[6] != IPPROTO_UDP:
+            return None
+        src = socket.inet_ntop(socket.AF_INET6, packet[8:24])
+        dst = socket.inet_ntop(socket.AF_INET6, packet[24:40])
+    else:
+        return None
+    sport, dport, length = struct.unpack_from('!HHH', packet, header_length)
+    data = packet[header_length + 8:header_length + max(8, length)]
+    return (src, sport), (dst, dport), data
+
+
+def read_packets(f, ports=(SLP_PORT,)):
+    for timestamp, linktype, frame in read_frames(f):
+        try:
+            ethertype, packet = decode_link(linktype, frame)
+            udp = decode_udp(ethertype, packet) if packet else None
+        except (IndexError, struct.error, ValueError):
+            continue
+        if udp is None:
+            continue
+        src, dst, data = udp
+        if ports and src[1] not in ports and dst[1] not in ports:
+            continue
+        yield Packet(timestamp, src, dst, data)
+
+
+def open_packets(path, ports=(SLP_PORT,)):
+    with open(path, 'rb') as f:
+        yield from read_packets(f, ports)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import heapq
+from collections import OrderedDict
+
+from pyslp import parse, creator
+
+LIFETIME_PERMANENT = 65535
+
+EVICT_EXPIRY = 'expiry'
+EVICT_LRU = 'lru'
+
+
+def naming_authority(service_type):
+    # 'service:printer.acme:lpr' -> 'acme', IANA types have an empty naming authority
+    name = service_type[8:] if service_type.startswith('service:') else service_type
+    name = name.split(':', 1)[0]
+    return name.split('.', 1)[1] if '.' in name else ''
+
+
+class Entry(dict):
+    # url_entry and attrs are kept encoded for replies, entry['attr_list'] is decoded on access
+
+    def __missing__(self, key):
+        if key == 'attr_list':
+            return self['attrs'].decode()
+        raise KeyError(key)
+
+
+# estimated cost of one registration besides its strings: the entry dict, its
+# timestamp, the heap item and the slots in the url/service type/source indexes
+ENTRY_OVERHEAD = (
+    sys.getsizeof(Entry(attrs=b'', url_entry=b'', local_ts=0.0, lifetime=0, service_type='', source=None, nbytes=0)) +
+    sys.getsizeof(0.0) + sys.getsizeof((0.0, '')) + 4 * 24
+)
+
+
+class RegistryError(Exception):
+
+    def __init__(self, message, error_code=parse.INTERNAL_ERROR):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class Registry:
+
+    def __init__(self, max_entries=None, max_entries_per_source=None, max_entries_per_type=None,
+                 max_attr_bytes=None, max_bytes=None, eviction=EVICT_EXPIRY):
+        self.services = dict()
+        self.service_lists = dict()
+        self.positions = dict()
+        self.versions = dict()
+        self.naming_authorities = dict()
+        self.sources = dict()
+        self.url_entries = OrderedDict()
+        self.deadlines = list()
+
+        self.max_entries = max_entries
+        self.max_entries_per_source = max_entries_per_source
+        self.max_entries_per_type = max_entries_per_type
+        self.max_attr_bytes = max_attr_bytes
+        self.max_bytes = max_bytes
+        if eviction not in (EVICT_EXPIRY, EVICT_LRU, None):
+            raise ValueError('Unknown eviction policy: {}'.format(eviction))
+        self.eviction = eviction
+
+        self.nbytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.url_entries)
+
+    def __contains__(self, url):
+        return url in self.url_entries
+
+    def get(self, url):
+        return self.url_entries.get(url)
+
+    def add(self, service_type, url, lifetime=LIFETIME_PERMANENT, attr_list='', local_ts=None, source=None,
+            url_entry=None):
+        # attr_list may be given encoded and url_entry as sent in a SrvReg, so neither is re-encoded
+        attrs = attr_list.encode() if isinstance(attr_list, str) else attr_list
+        if self.max_attr_bytes is not None and len(attrs) > self.max_attr_bytes:
+            raise RegistryError('Attribute list is too long', parse.INVALID_REGISTRATION)
+        if url_entry is None:
+            url_entry = creator.create_url_entry(lifetime, url)
+
+        entry = self.url_entries.get(url)
+        if entry is not None and (entry['service_type'] != service_type or entry['source'] != source):
+            self.remove(url)
+            entry = None
+
+        nbytes = ENTRY_OVERHEAD + sys.getsizeof(url) + sys.getsizeof(attrs) + sys.getsizeof(url_entry)
+        self.make_room(url, service_type, source, nbytes - (0 if entry is None else entry['nbytes']), entry is None)
+
+        local_ts = time.monotonic() if local_ts is None else local_ts
+        if entry is None:
+            if service_type in self.services:
+                self.services[service_type].add(url)
+            else:
+                self.services[service_type] = {url}
+                self.naming_authorities.setdefault(naming_authority(service_type), set()).add(service_type)
+                self.nbytes += sys.getsizeof(service_type)
+            if source is not None:
+                self.sources.setdefault(source, set()).add(url)
+            urls = self.service_lists.setdefault(service_type, [])
+            self.positions[url] = len(urls)
+            urls.append(url)
+            entry = self.url_entries[url] = Entry(service_type=service_type, source=source, nbytes=0)
+            self.versions[service_type] = self.versions.get(service_type, 0) + 1
+        else:
+            # refreshed registrations move to the end, so the first entry is the least recently refreshed
+            self.url_entries.move_to_end(url)
+            if entry['attrs'] != attrs:
+                self.versions[service_type] += 1
+
+        self.nbytes += nbytes - entry['nbytes']
+        entry.update(
+            attrs=attrs,
+            url_entry=url_entry,
+            local_ts=local_ts,
+            lifetime=lifetime,
+            nbytes=nbytes
+        )
+        if lifetime != LIFETIME_PERMANENT:
+            heapq.heappush(self.deadlines, (local_ts + lifetime, url))
+            if len(self.deadlines) > 2 * len(self.url_entries) + 64:
+                self.compact()
+            return local_ts + lifetime
+        return None
+
+    def make_room(self, url, service_type, source, nbytes, new):
+        if new and self.max_entries_per_type is not None:
+            urls = self.services.get(service_type, ())
+            while len(urls) >= self.max_entries_per_type:
+                self.evict(urls, url)
+        if new and source is not None and self.max_entries_per_source is not None:
+            urls = self.sources.get(source, ())
+            while len(urls) >= self.max_entries_per_source:
+                self.evict(urls, url)
+        if new and self.max_entries is not None:
+            while len(self.url_entries) >= self.max_entries:
+                self.evict(None, url)
+        if self.max_bytes is not None:
+            while self.nbytes + nbytes > self.max_bytes:
+                self.evict(None, url)
+
+    def evict(self, urls, keep):
+        victim = None if self.eviction is None else self.victim(urls, keep)
+        if victim is None:
+            raise RegistryError('Registry is full')
+        self.remove(victim)
+        self.evictions += 1
+
+    def victim(self, urls, keep):
+        if urls is None:
+            # whole registry: the heap top or the oldest entry, no scan needed
+            if self.eviction == EVICT_EXPIRY and self.next_deadline() is not None:
+                url = self.deadlines[0][1]
+                if url != keep:
+                    return url
+            for url in self.url_entries:
+                if url != keep:
+                    return url
+            return None
+
+        # one source or service type, bounded by its own cap
+        if self.eviction == EVICT_EXPIRY:
+            def key(url):
+                deadline = self._deadline(url)
+                return float('inf') if deadline is None else deadline, self.url_entries[url]['local_ts']
+        else:
+            def key(url):
+                return self.url_entries[url]['local_ts']
+        return min((url for url in urls if url != keep), key=key, default=None)
+
+    def compact(self):
+        self.deadlines = [
+            (deadline, url) for deadline, url in self.deadlines if self._deadline(url) == deadline
+        ]
+        heapq.heapify(self.deadlines)
+
+    def remove(self, url):
+        entry = self.url_entries.pop(url, None)
+        if entry is None:
+            return None
+        self.nbytes -= entry['nbytes']
+        service_type = entry['service_type']
+        self.services[service_type].discard(url)
+
+        # swap with the last URL of the type so that removal stays O(1)
+        urls = self.service_lists[service_type]
+        position = self.positions.pop(url)
+        last = urls.pop()
+        if last != url:
+            urls[position] = last
+            self.positions[last] = position
+        self.versions[service_type] += 1
+
+        if not self.services[service_type]:
+            self.services.pop(service_type, None)
+            self.service_lists.pop(service_type, None)
+            self.versions.pop(service_type, None)
+            authority = naming_authority(service_type)
+            self.naming_authorities[authority].discard(service_type)
+            if not self.naming_authorities[authority]:
+                self.naming_authorities.pop(authority, None)
+            self.nbytes -= sys.getsizeof(service_type)
+        source = entry['source']
+        if source is not None:
+            self.sources[source].discard(url)
+            if not self.sources[source]:
+                self.sources.pop(source, None)
+        return entry
+
+    def usage(self):
+        return dict(
+            entries=len(self.url_entries),
+            service_types=len(self.services),
+            sources=len(self.sources),
+            bytes=self.nbytes,
+            evictions=self.evictions
+        )
+
+    def service_types(self, naming_authority=None):
+        if naming_authority is None:
+            return list(self.services)
+        return list(self.naming_authorities.get(naming_authority, ()))
+
+    def lookup(self, service_type, urls=None):
+        url_entries = list()
+        for url in self.services.get(service_type, ()) if urls is None else urls:
+            url_entries.append(
+                dict(
+                    url=url,
+                    lifetime=self.url_entries[url]['lifetime']
+                )
+            )
+        return url_entries
+
+    def encoded_url_entries(self, service_type, urls=None):
+        url_entries = self.url_entries
+        if urls is None:
+            urls = self.services.get(service_type, ())
+        return [url_entries[url]['url_entry'] for url in urls]
+
+    def _deadline(self, url):
+        entry = self.url_entries.get(url)
+        if entry is None or entry['lifetime'] == LIFETIME_PERMANENT:
+            return None
+        return entry['local_ts'] + entry['lifetime']
+
+    def next_deadline(self):
+        # heap items of removed or refreshed registrations are dropped lazily
+        while self.deadlines:
+            deadline, url = self.deadlines[0]
+            if self._deadline(url) == deadline:
+                return deadline
+            heapq.heappop(self.deadlines)
+        return None
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        urls = list()
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _, url = heapq.heappop(self.deadlines)
+            self.remove(url)
+            urls.append(url)
+        return urls
+
+    def __iter__(self):
+        for url, entry in self.url_entries.items():
+            yield dict(
+                service_type=entry['service_type'],
+                url=url,
+                lifetime=entry['lifetime'],
+                attr_list=entry['attr_list']
+            )
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import time
+import asyncio
+from collections import Counter, namedtuple
+
+from pyslp import multicast
+from pyslp.registry import RegistryError, LIFETIME_PERMANENT
+
+# ts is the origin's wall clock and orders concurrent changes of one URL,
+# (origin, seq) numbers the change stream of every node for gap repair
+Change = namedtuple('Change', 'origin seq ts op service_type url expires attr_list')
+
+REGISTER = 'register'
+DEREGISTER = 'deregister'
+
+
+class ReplicationProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, replicator):
+        self.replicator = replicator
+
+    def datagram_received(self, data, addr):
+        self.replicator.datagram_received(data, addr)
+
+
+class Replicator:
+    # changes are pushed as they happen and repaired from periodic digests; expiry is not
+    # replicated, every node expires registrations by the wall-clock time in the change
+
+    def __init__(self, slpd, ip_addr, port, peers, node_id=None, interval=5, tombstone_ttl=None,
+                 network=multicast, loop=None, max_datagram=8192):
+        self.slpd = slpd
+        self.ip_addr = ip_addr
+        self.port = port
+        self.peers = [tuple(peer) for peer in peers]
+        # the boot timestamp keeps sequence numbers of a restarted node apart from the old ones
+        self.node_id = node_id or '{}:{}@{}'.format(ip_addr, port, slpd.boot_timestamp)
+        self.interval = interval
+        self.tombstone_ttl = 10 * interval if tombstone_ttl is None else tombstone_ttl
+        self.network = network
+        self.loop = loop
+        self.max_datagram = max_datagram
+
+        self.seq = 0
+        self.changes = dict()
+        self.vector = dict()
+        self.outbox = list()
+
+        self.transport = None
+        self.flush_handle = None
+        self.digest_handle = None
+
+    async def start(self):
+        self.loop = self.loop or asyncio.get_running_loop()
+        self.transport = await self.network.create_unicast_listener(
+            lambda: ReplicationProtocol(self), self.ip_addr, self.port, loop=self.loop
+        )
+        self.slpd.add_observer(self.observe)
+        self.digest_handle = self.loop.call_later(self.interval, self.digest_expired)
+
+    def close(self):
+        for handle in [self.flush_handle, self.digest_handle]:
+            if handle is not None:
+                handle.cancel()
+        self.flush_handle = self.digest_handle = None
+        if self.observe in self.slpd.observers:
+            self.slpd.observers.remove(self.observe)
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def observe(self, op, interface, registration):
+        url = registration['url']
+        now = time.time()
+        if op == REGISTER:
+            lifetime = registration.get('lifetime', LIFETIME_PERMANENT)
+            expires = None if lifetime == LIFETIME_PERMANENT else now + lifetime
+            service_type, attr_list = registration['service_type'], registration.get('attr_list', '')
+        else:
+            expires, service_type, attr_list = now + self.tombstone_ttl, None, None
+
+        # a multicast SrvReg reaches every interface, only the first copy is a change
+        change = self.changes.get(url)
+        if change is not None and change.origin == self.node_id and change.op == op and \
+                change.service_type == service_type and change.attr_list == attr_list and \
+                (change.expires == expires or (change.expires and expires and abs(change.expires - expires) < 1)):
+            return
+
+        self.seq += 1
+        self.vector[self.node_id] = self.seq
+        change = Change(self.node_id, self.seq, now, op, service_type, url, expires, attr_list)
+        self.changes[url] = change
+        self.outbox.append(change)
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flush_handle = None
+        changes, self.outbox = self.outbox, list()
+        ranges = {self.node_id: (changes[0].seq - 1, changes[-1].seq)}
+        for peer in self.peers:
+            self.send_changes(changes, peer, ranges)
+
+    def send_changes(self, changes, addr, ranges):
+        # changes are sorted by (origin, seq) and split to stay below max_datagram; every
+        # datagram names the sequence range of each origin it covers completely, and a
+        # receiver only moves its vector over ranges adjacent to what it already has
+        since = {origin: low for origin, (low, _) in ranges.items()}
+        remaining = Counter(change.origin for change in changes)
+        batch, batch_ranges, size = list(), dict(), 0
+        for origin, (low, high) in ranges.items():
+            if not remaining[origin]:
+                batch_ranges[origin] = (low, high)
+        for change in changes:
+            item = len(json.dumps(change, separators=(',', ':'))) + 1
+            if batch and size + item > self.max_datagram:
+                self.send(dict(type='changes', changes=batch, ranges=batch_ranges), addr)
+                batch, batch_ranges, size = list(), dict(), 0
+            batch.append(change)
+            size += item
+            remaining[change.origin] -= 1
+            high = change.seq if remaining[change.origin] else ranges[change.origin][1]
+            low = batch_ranges.get(change.origin, (since[change.origin],))[0]
+            batch_ranges[change.origin] = (low, high)
+            since[change.origin] = high
+        if batch or batch_ranges:
+            self.send(dict(type='changes', changes=batch, ranges=batch_ranges), addr)
+
+    def send(self, message, addr):
+        if self.transport is None:
+            return
+        message['node'] = self.node_id
+        self.transport.sendto(json.dumps(message, separators=(',', ':')).encode(), addr)
+
+    def digest_expired(self):
+        self.digest_handle = self.loop.call_later(self.interval, self.digest_expired)
+        self.collect()
+        for peer in self.peers:
+            self.send(dict(type='digest', vector=self.vector), peer)
+
+    def collect(self):
+        # tombstones and lapsed registrations are not needed for repair any more
+        now = time.time()
+        for url in [url for url, change in self.changes.items() if change.expires is not None and change.expires < now]:
+            del self.changes[url]
+
+    def datagram_received(self, data, addr):
+        # only peers may change the registry or ask for the change log
+        if tuple(addr[:2]) not in self.peers:
+            return
+        try:
+            message = json.loads(data.decode())
+            if message['type'] == 'changes':
+                self.apply([Change(*change) for change in message['changes']], message['ranges'])
+            elif message['type'] == 'digest':
+                self.repair(message['vector'], addr)
+        except (ValueError, KeyError, TypeError):
+            return
+
+    def repair(self, vector, addr):
+        ranges = {
+            origin: (vector.get(origin, 0), seq) for origin, seq in self.vector.items() if seq > vector.get(origin, 0)
+        }
+        if not ranges:
+            return
+        changes = [
+            change for change in self.changes.values()
+            if change.origin in ranges and ranges[change.origin][0] < change.seq <= ranges[change.origin][1]
+        ]
+        changes.sort(key=lambda change: (change.origin, change.seq))
+        self.send_changes(changes, addr, ranges)
+
+    def apply(self, changes, ranges):
+        now = time.time()
+        for change in changes:
+            if change.origin == self.node_id:
+                continue
+            current = self.changes.get(change.url)
+            if current is not None and (current.ts, current.origin) >= (change.ts, change.origin):
+                continue
+            self.changes[change.url] = change
+
+            if change.op == REGISTER and (change.expires is None or change.expires > now):
+                lifetime = LIFETIME_PERMANENT if change.expires is None else math.ceil(change.expires - now)
+                for registry in self.slpd.registries.values():
+                    try:
+                        registry.add(change.service_type, change.url, lifetime=lifetime, attr_list=change.attr_list)
+                    except RegistryError:
+                        pass
+            else:
+                for registry in self.slpd.registries.values():
+                    registry.remove(change.url)
+
+        for origin, (low, high) in ranges.items():
+            if origin != self.node_id and self.vector.get(origin, 0) >= low:
+                self.vector[origin] = max(self.vector.get(origin, 0), high)
+        self.slpd.schedule_expiry()
+
+
+async def create_replicator(slpd, ip_addr, port, peers, **kwargs):
+    replicator = Replicator(slpd, ip_addr, port, peers, **kwargs)
+    await replicator.start()
+    return replicator
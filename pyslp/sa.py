@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from pyslp import multicast
+from pyslp.utils import get_lst
+from pyslp.slpd import SLPDServer
+from pyslp.registry import LIFETIME_PERMANENT
+
+
+class ServiceAgent(SLPDServer):
+    # answers requests for the registrations of its own process only, SrvReg/SrvDeReg are ignored
+
+    empty_multicast_replies = False
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.handlers = {
+            1: self.handle_request,
+            6: self.handle_attr_request,
+            9: self.handle_srv_type_request
+        }
+        # registrations by URL, replayed into the registry of every interface added later
+        self.services = dict()
+
+    async def add_interface(self, ip_addr):
+        new = ip_addr not in self.ip_addrs
+        await super().add_interface(ip_addr)
+        if not new:
+            return
+        now = time.monotonic()
+        registrations = list()
+        for registration in self.services.values():
+            lifetime = registration['lifetime']
+            if lifetime != LIFETIME_PERMANENT:
+                lifetime = int(registration['local_ts'] + lifetime - now)
+                if lifetime <= 0:
+                    continue
+            registrations.append(dict(registration, lifetime=lifetime))
+        self.register_many(registrations, [ip_addr])
+
+    def register(self, service_type, url, attr_list='', lifetime=LIFETIME_PERMANENT):
+        registration = dict(
+            service_type=service_type, url=url, attr_list=attr_list, lifetime=lifetime, local_ts=time.monotonic()
+        )
+        self.services[url] = registration
+        self.register_many([registration])
+
+    def deregister(self, url):
+        self.services.pop(url, None)
+        self.deregister_many([url])
+
+    def expire_now(self):
+        count = super().expire_now()
+        now = time.monotonic()
+        for url, registration in list(self.services.items()):
+            lifetime = registration['lifetime']
+            if lifetime != LIFETIME_PERMANENT and registration['local_ts'] + lifetime <= now:
+                del self.services[url]
+        return count
+
+
+async def create_service_agent(ip_addrs, mcast_port=427, mcast_group='239.255.255.253', loop=None, scope='DEFAULT',
+                               metrics=None, hook=None, network=multicast):
+    ip_addrs = get_lst(ip_addrs)
+    service_agent = ServiceAgent(
+        scope=scope, metrics=metrics, hook=hook, mcast_port=mcast_port, mcast_group=mcast_group, loop=loop,
+        network=network
+    )
+    await service_agent.update(ip_addrs)
+    return service_agent
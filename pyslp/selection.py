@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import re
+import random
+import weakref
+import itertools
+from bisect import bisect_right, insort
+
+
+def attribute_value(attr_list, name, default=None):
+    # the value of (name=value) in an attribute list as a float
+    match = re.search(r'\(\s*{}\s*=\s*([^),]*)'.format(re.escape(name)), attr_list, re.IGNORECASE)
+    if match is None:
+        return default
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return default
+
+
+class Selection:
+    # picks at most count URLs of a type from registry.service_lists, touching only those;
+    # per-type state goes away with its registry
+
+    def __init__(self):
+        self.states = weakref.WeakKeyDictionary()
+
+    def state(self, registry, service_type, factory):
+        states = self.states.setdefault(registry, dict())
+        state = states.get(service_type)
+        if state is None:
+            state = states[service_type] = factory()
+        return state
+
+    def select(self, registry, service_type, count):
+        raise NotImplementedError
+
+
+class RandomSelection(Selection):
+
+    def __init__(self, seed=None):
+        super().__init__()
+        self.random = random.Random(seed)
+
+    def select(self, registry, service_type, count):
+        urls = registry.service_lists.get(service_type, ())
+        if count >= len(urls):
+            return list(urls)
+        return [urls[i] for i in self.random.sample(range(len(urls)), count)]
+
+
+class RoundRobinSelection(Selection):
+
+    def select(self, registry, service_type, count):
+        urls = registry.service_lists.get(service_type, ())
+        size = len(urls)
+        if count >= size:
+            return list(urls)
+        cursor = self.state(registry, service_type, lambda: [0])
+        start = cursor[0] % size
+        cursor[0] = start + count
+        return [urls[(start + i) % size] for i in range(count)]
+
+
+class WeightedSelection(Selection):
+    # URLs are drawn without replacement with probability proportional to the attribute
+    # (or to 1 / (1 + value) with inverse=True); zero weights only fill what is left over
+
+    def __init__(self, attribute='weight', default=1.0, inverse=False, seed=None):
+        super().__init__()
+        self.attribute = attribute
+        self.default = default
+        self.inverse = inverse
+        self.random = random.Random(seed)
+
+    def weight(self, attr_list):
+        value = attribute_value(attr_list, self.attribute, self.default)
+        if value is None or value < 0:
+            return 0.0
+        if self.inverse:
+            return 1.0 / (1.0 + value)
+        return value
+
+    def weights(self, registry, service_type):
+        # rebuilt only when the registrations or attributes of the type change
+        state = self.state(registry, service_type, lambda: dict(version=None))
+        version = registry.versions.get(service_type)
+        if state['version'] != version:
+            urls = list(registry.service_lists.get(service_type, ()))
+            weights = [self.weight(registry.url_entries[url]['attr_list']) for url in urls]
+            state.update(
+                version=version,
+                urls=urls,
+                totals=list(itertools.accumulate(weights)),
+                positive=sum(1 for weight in weights if weight > 0),
+                zeros=[i for i, weight in enumerate(weights) if weight <= 0]
+            )
+        return state
+
+    def select(self, registry, service_type, count):
+        state = self.weights(registry, service_type)
+        urls = state['urls']
+        chosen = self.draw(state['totals'], min(count, state['positive']))
+        if len(chosen) < count:
+            zeros = state['zeros']
+            chosen += self.random.sample(zeros, min(count - len(chosen), len(zeros)))
+        return [urls[i] for i in chosen]
+
+    def draw(self, totals, count):
+        # every draw is made over the weights left after removing the chosen URLs: a point
+        # in the reduced range is moved past the intervals of the chosen ones, O(count) each
+        chosen, ordered = list(), list()
+        remaining = totals[-1] if totals else 0
+        while len(chosen) < count and remaining > 0:
+            point = self.random.random() * remaining
+            for i in ordered:
+                start = totals[i - 1] if i else 0
+                if start > point:
+                    break
+                point += totals[i] - start
+            i = bisect_right(totals, point)
+            if i >= len(totals) or i in chosen:
+                # only rounding gets here, with the range spent
+                break
+            chosen.append(i)
+            insort(ordered, i)
+            remaining -= totals[i] - (totals[i - 1] if i else 0)
+        return chosen
+
+
+POLICIES = {
+    'random': RandomSelection,
+    'round-robin': RoundRobinSelection,
+    'weighted': WeightedSelection
+}
+
+
+def get_selection(selection):
+    if selection is None:
+        return RandomSelection()
+    if isinstance(selection, str):
+        return POLICIES[selection]()
+    return selection
@@ -1,162 +1,542 @@
 # -*- coding: utf-8 -*-
 
-import copy
+import time
 import asyncio
-from datetime import datetime
+from collections import Counter
 
 from pyslp.utils import get_lst
+from pyslp.metrics import Metrics
+from pyslp.registry import Registry, RegistryError, LIFETIME_PERMANENT
+from pyslp.selection import get_selection
 from pyslp import parse, creator, multicast
 
 
 class SLPDServer:
 
-    def __init__(self, scope='DEFAULT'):
-        self.services = dict()
-        self.url_entries = dict()
-        self.lifetime = dict()
+    # slpd also answers multicast requests it has nothing for, so that clients get an empty
+    # result rather than a timeout; a Service Agent stays quiet as RFC 2608 section 8 asks
+    empty_multicast_replies = True
+
+    def __init__(self, scope='DEFAULT', metrics=None, hook=None, da=False, da_heartbeat=10800,
+                 batch_size=None, pktinfo=False, mcast_port=427, mcast_group='239.255.255.253', loop=None,
+                 network=multicast, limits=None, max_results=None, selection=None):
+        self.registries = dict()
+        self.limits = dict(limits or {})
+
+        self.max_results = max_results
+        self.selection = get_selection(selection) if max_results else selection
 
-        self.flag_continue = True
         self.transports = list()
+        self.listeners = dict()
         self.ip_addrs = list()
 
         self.scope = scope
+        self.mcast_port = mcast_port
+        self.mcast_group = mcast_group
+        self.loop = loop
+        self.network = network
 
-    def connection_made(self, transport):
-        self.transports.append(transport)
+        self.expiry_handle = None
+        self.expiry_deadline = None
 
-    @asyncio.coroutine
-    def update(self, ip_addrs=list(), mcast_port=None, mcast_group=None):
-        while self.flag_continue:
-            for interface in self.ip_addrs:
-                urls = list()
-                lifetime = copy.copy(self.lifetime[interface])
-                for url in lifetime:
-                    if lifetime[url] == 65535:
-                        continue
-                    utc = datetime.strptime(self.url_entries[interface][url]['local_ts'], "%Y-%m-%d %H:%M:%S.%f")
-                    delta_utc = (datetime.utcnow() - utc).total_seconds()
-                    if delta_utc > lifetime[url]:
-                        urls.append(url)
-                for url in urls:
-                    self.remove(interface, url)
-
-            for ip_addr in list(set(ip_addrs) - set(self.ip_addrs)):
-                yield from multicast.create_listener(
-                    lambda: Receiver(self, ip_addr),
-                    ip_addr, mcast_port, mcast_group
-                )
-                self.ip_addrs.append(ip_addr)
+        self.metrics = metrics or Metrics()
+        self.metrics.add_collector(self.collect_metrics)
 
-                self.services[ip_addr] = dict()
-                self.url_entries[ip_addr] = dict()
-                self.lifetime[ip_addr] = dict()
+        self.hook = hook
 
-            yield from asyncio.sleep(0.5)
+        self.da = da
+        self.da_heartbeat = da_heartbeat
+        self.da_heartbeat_handle = None
+        self.da_adverts = dict()
+        self.boot_timestamp = int(time.time())
 
-    def remove(self, interface, url):
-        service_type = self.url_entries[interface][url]['service_type']
-        self.services[interface][service_type].remove(url)
-        if not self.services[interface][service_type]:
-            self.services[interface].pop(service_type,  None)
-        self.lifetime[interface].pop(url, None)
-        self.url_entries[interface].pop(url, None)
+        self.batch_size = batch_size
+        self.pktinfo = pktinfo
+        self.pktinfo_transport = None
 
-    def datagram_received(self, data, addr, interface, transport):
-        header, _ = parse.parse_header(data)
-        if header['function_id'] == 3:
-            response = creator.create_acknowledge(xid=header['xid'])
-
-            header, url_entries, msg = parse.parse_registration(data)
-
-            if msg['scope_list'] != self.scope:
-                return
+        self.observers = list()
 
-            service_type = msg['service_type']
-            url = url_entries['url']
-            lifetime = url_entries['lifetime']
+        self.handlers = {
+            1: self.handle_request,
+            3: self.handle_registration,
+            4: self.handle_deregistration,
+            6: self.handle_attr_request,
+            9: self.handle_srv_type_request
+        }
 
-            if service_type in self.services[interface]:
-                self.services[interface][service_type].update({url})
-                self.lifetime[interface][url] = lifetime
+    def connection_made(self, transport, interface=None):
+        self.transports.append(transport)
+        if interface is not None:
+            self.listeners.setdefault(interface, []).append(transport)
+
+    async def add_interface(self, ip_addr):
+        self.loop = self.loop or asyncio.get_running_loop()
+        if ip_addr in self.ip_addrs:
+            return
+        self.ip_addrs.append(ip_addr)
+        self.registry(ip_addr)
+        try:
+            await self.create_listeners(ip_addr)
+        except:
+            self.ip_addrs.remove(ip_addr)
+            self.close_listeners(ip_addr)
+            self.registries.pop(ip_addr, None)
+            raise
+        self.schedule_expiry()
+
+        if self.da:
+            await self.send_da_advert(ip_addr)
+            if self.da_heartbeat_handle is None:
+                self.da_heartbeat_handle = self.loop.call_later(self.da_heartbeat, self.da_heartbeat_expired)
+
+    async def remove_interface(self, ip_addr):
+        if ip_addr not in self.ip_addrs:
+            return
+        self.ip_addrs.remove(ip_addr)
+        self.close_listeners(ip_addr)
+        self.registries.pop(ip_addr, None)
+
+        if self.da:
+            try:
+                await self.send_da_advert(ip_addr, boot_timestamp=0)
+            except OSError:
+                # the address is usually gone already, so the goodbye DAAdvert is best-effort
+                pass
+            self.da_adverts.pop(ip_addr, None)
+
+    async def update(self, ip_addrs):
+        ip_addrs = get_lst(ip_addrs)
+        for ip_addr in [ip_addr for ip_addr in self.ip_addrs if ip_addr not in ip_addrs]:
+            await self.remove_interface(ip_addr)
+        for ip_addr in ip_addrs:
+            await self.add_interface(ip_addr)
+
+    def close_listeners(self, ip_addr):
+        if self.pktinfo_transport is not None:
+            self.pktinfo_transport.remove_interface(ip_addr)
+        for transport in self.listeners.pop(ip_addr, []):
+            transport.close()
+            self.transports.remove(transport)
+
+    async def create_listeners(self, ip_addr):
+        if self.pktinfo:
+            if self.pktinfo_transport is None:
+                self.pktinfo_transport = await self.network.create_pktinfo_listener(
+                    self.datagram_received, [], self.mcast_port, self.mcast_group,
+                    loop=self.loop, batch_size=self.batch_size or 1
+                )
+                self.connection_made(self.pktinfo_transport)
+            self.pktinfo_transport.add_interface(ip_addr)
+            return
+
+        groups = [self.mcast_group, None] if self.da else [self.mcast_group]
+        for group in groups:
+            if self.batch_size:
+                transport = await self.network.create_batch_listener(
+                    lambda data, addr, transport: self.datagram_received(data, addr, ip_addr, transport),
+                    ip_addr, self.mcast_port, group,
+                    loop=self.loop, batch_size=self.batch_size
+                )
+                self.connection_made(transport, ip_addr)
+            elif group is None:
+                await self.network.create_unicast_listener(
+                    lambda: Receiver(self, ip_addr),
+                    ip_addr, self.mcast_port, loop=self.loop
+                )
             else:
-                self.services[interface][service_type] = {url}
-                self.lifetime[interface][url] = lifetime
-
-            self.url_entries[interface][url] = dict(
-                attr_list=msg['attr_list'],
-                local_ts=str(datetime.utcnow()),
-                lifetime=lifetime,
-                service_type=service_type
-            )
-
-            transport.sendto(response, addr)
+                await self.network.create_listener(
+                    lambda: Receiver(self, ip_addr),
+                    ip_addr, self.mcast_port, group, loop=self.loop
+                )
 
-        elif header['function_id'] == 1:
-            header, msg = parse.parse_request(data)
+    def schedule_expiry(self, deadline=None):
+        if self.loop is None:
+            # nothing runs before the first interface is added, which reschedules
+            return
 
-            if msg['scope_list'] != self.scope:
+        if deadline is None:
+            deadlines = [registry.next_deadline() for registry in self.registries.values()]
+            deadlines = [deadline for deadline in deadlines if deadline is not None]
+            if not deadlines:
                 return
+            deadline = min(deadlines)
 
-            service_type = msg['service_type']
-
-            if service_type not in self.services[interface]:
-                response = creator.create_reply(xid=header['xid'], url_entries=[])
-                transport.sendto(response, addr)
+        if self.expiry_handle is not None:
+            if self.expiry_deadline <= deadline:
                 return
-
-            urls = list(self.services[interface][service_type])
-            url_entries = list()
-            for url in urls:
-                url_entries.append(
-                    dict(
-                        url=url,
-                        lifetime=self.lifetime[interface][url]
-                    )
-                )
-
-            response = creator.create_reply(
-                xid=header['xid'],
-                url_entries=url_entries
+            self.expiry_handle.cancel()
+
+        self.expiry_deadline = deadline
+        self.expiry_handle = self.loop.call_later(max(0, deadline - time.monotonic()), self.expiry_expired)
+
+    def expiry_expired(self):
+        self.expiry_handle = None
+        self.expire_now()
+
+    def da_heartbeat_expired(self):
+        self.da_heartbeat_handle = self.loop.call_later(self.da_heartbeat, self.da_heartbeat_expired)
+        for ip_addr in self.ip_addrs:
+            self.loop.create_task(self.send_da_advert(ip_addr))
+
+    def create_da_advert(self, interface, xid=0, boot_timestamp=None):
+        return creator.create_da_advert(
+            url='service:directory-agent://{}'.format(interface),
+            scope_list=self.scope,
+            boot_timestamp=self.boot_timestamp if boot_timestamp is None else boot_timestamp,
+            xid=xid
+        )
+
+    async def send_da_advert(self, ip_addr, boot_timestamp=None):
+        transport = await self.network.create_sender(
+            asyncio.DatagramProtocol, ip_addr, 0, loop=self.loop
+        )
+        try:
+            transport.sendto(
+                self.create_da_advert(ip_addr, boot_timestamp=boot_timestamp),
+                (self.mcast_group, self.mcast_port)
             )
-            transport.sendto(response, addr)
+        finally:
+            transport.close()
+        self.da_adverts[ip_addr] = time.monotonic()
 
-        elif header['function_id'] == 6:
-            header, msg = parse.parse_attr_request(data)
+    def add_observer(self, observer):
+        # observer(op, interface, registration) is called for every accepted 'register'/'deregister'
+        self.observers.append(observer)
 
-            if msg['scope_list'] != self.scope:
-                return
+    def notify(self, op, interface, registration):
+        for observer in self.observers:
+            observer(op, interface, registration)
 
-            url = msg['url']
+    def registry(self, interface):
+        registry = self.registries.get(interface)
+        if registry is None:
+            registry = self.registries[interface] = Registry(**self.limits)
+        return registry
 
-            attr_list = ''
-            if url in self.url_entries[interface]:
-                attr_list = self.url_entries[interface][url]['attr_list']
+    def remove(self, interface, url):
+        self.registries[interface].remove(url)
+
+    def register_many(self, registrations, interfaces=None):
+        interfaces = list(self.registries) if interfaces is None else get_lst(interfaces)
+        registries = [self.registry(interface) for interface in interfaces]
+        evictions = [registry.evictions for registry in registries]
+        count = 0
+        for registration in registrations:
+            for interface, registry in zip(interfaces, registries):
+                try:
+                    registry.add(
+                        service_type=registration['service_type'],
+                        url=registration['url'],
+                        lifetime=registration.get('lifetime', LIFETIME_PERMANENT),
+                        attr_list=registration.get('attr_list', ''),
+                        source=registration.get('source')
+                    )
+                except RegistryError:
+                    self.metrics.inc('pyslp_slpd_rejected_total', interface=interface)
+            if self.observers:
+                self.notify('register', None, registration)
+            count += 1
+        for interface, registry, before in zip(interfaces, registries, evictions):
+            if registry.evictions != before:
+                self.metrics.inc('pyslp_slpd_evicted_total', registry.evictions - before, interface=interface)
+        self.schedule_expiry()
+        return count
+
+    def deregister_many(self, urls, interfaces=None):
+        interfaces = list(self.registries) if interfaces is None else get_lst(interfaces)
+        count = 0
+        for url in urls:
+            for interface in interfaces:
+                if self.registries[interface].remove(url) is not None:
+                    count += 1
+            if self.observers:
+                self.notify('deregister', None, dict(url=url))
+        return count
+
+    def lookup(self, service_type, interface=None):
+        interfaces = list(self.registries) if interface is None else [interface]
+        url_entries = list()
+        for interface in interfaces:
+            registry = self.registries[interface]
+            for url_entry in registry.lookup(service_type):
+                url_entry.update(
+                    interface=interface,
+                    attr_list=registry.get(url_entry['url'])['attr_list']
+                )
+                url_entries.append(url_entry)
+        return url_entries
+
+    def service_types(self, naming_authority=None, interface=None):
+        interfaces = list(self.registries) if interface is None else [interface]
+        service_types = set()
+        for interface in interfaces:
+            service_types.update(self.registries[interface].service_types(naming_authority))
+        return sorted(service_types)
+
+    def iter_registrations(self, interface=None):
+        interfaces = list(self.registries) if interface is None else [interface]
+        for interface in interfaces:
+            for registration in self.registries[interface]:
+                registration['interface'] = interface
+                yield registration
+
+    def expire_now(self):
+        count = 0
+        now = time.monotonic()
+        for interface, registry in self.registries.items():
+            urls = registry.expire(now)
+            if urls:
+                self.metrics.inc('pyslp_slpd_expired_total', len(urls), interface=interface)
+                count += len(urls)
+        self.schedule_expiry()
+        return count
+
+    def collect_metrics(self, metrics):
+        for interface, registry in self.registries.items():
+            metrics.set_gauge('pyslp_slpd_registrations', len(registry), interface=interface)
+            metrics.set_gauge('pyslp_slpd_service_types', len(registry.services), interface=interface)
+            metrics.set_gauge('pyslp_slpd_registry_bytes', registry.nbytes, interface=interface)
+        send_errors = Counter()
+        for transport in self.transports:
+            send_errors.update(getattr(transport, 'send_errors', ()))
+        for name, count in send_errors.items():
+            metrics.set_gauge('pyslp_slpd_send_errors', count, errno=name)
 
-            response = creator.create_attr_reply(
-                xid=header['xid'],
-                attr_list=attr_list
-            )
+    def datagram_received(self, data, addr, interface, transport):
+        start = time.monotonic()
+        hook = self.hook
+        info = None
+        if hook is not None:
+            info = dict(interface=interface, addr=addr, size=len(data))
+            hook('receive', start, info)
+
+        # the header is checked and decoded once here, the handler reuses it for the body
+        try:
+            parsed = parse.parse_header(data)
+        except parse.ParseError as e:
+            self.metrics.inc('pyslp_slpd_parse_errors_total', interface=interface)
+            response = self.create_error_reply(data, e.error_code)
+            if response is not None:
+                transport.sendto(response, addr)
+            return
+        header = parsed[0]
 
-            transport.sendto(response, addr)
+        function = parse.FUNCTION_NAMES.get(header['function_id'], str(header['function_id']))
+        self.metrics.inc('pyslp_slpd_requests_total', function=function, interface=interface)
 
-        elif header['function_id'] == 4:
-            header, url_entry, scope_list = parse.parse_deregistration(data)
+        if info is not None:
+            info.update(function=function, xid=header['xid'])
+            hook('header', time.monotonic(), info)
 
-            if scope_list != self.scope:
-                return
+        handler = self.handlers.get(header['function_id'])
+        if handler is None:
+            return
 
-            response = creator.create_acknowledge(xid=header['xid'])
-            url = url_entry['url']
-            if url not in self.url_entries[interface]:
-                transport.sendto(response, addr)
-                return
-            self.remove(interface, url)
+        try:
+            response = handler(data, interface, info, addr, parsed)
+        except (IndexError, ValueError) as e:
+            self.metrics.inc('pyslp_slpd_parse_errors_total', interface=interface)
+            response = self.create_error_reply(data, getattr(e, 'error_code', parse.PARSE_ERROR))
+
+        if response is not None:
             transport.sendto(response, addr)
+            if info is not None:
+                hook('send', time.monotonic(), info)
+
+        self.metrics.observe(
+            'pyslp_slpd_latency_seconds', time.monotonic() - start,
+            function=function, interface=interface
+        )
+
+    def create_error_reply(self, data, error_code):
+        # scope mismatches and malformed messages are only answered when unicast, other agents may serve them
+        if len(data) < parse.HEADER_LENGTH or data[5] & parse.FLAG_MCAST:
+            return None
+        return creator.create_error_reply(data[1], data[10] << 8 | data[11], error_code)
+
+    def previous_responder(self, pr_list, interface):
+        # a retransmitted multicast request lists the agents that have answered it already
+        if pr_list and interface in [addr.strip() for addr in pr_list.split(',')]:
+            self.metrics.inc('pyslp_slpd_previous_responder_total', interface=interface)
+            return True
+        return False
+
+    def drop_empty(self, data):
+        return not self.empty_multicast_replies and data[5] & parse.FLAG_MCAST
+
+    def out_of_scope(self, scope_list, interface):
+        if scope_list != self.scope:
+            self.metrics.inc('pyslp_slpd_scope_mismatch_total', interface=interface)
+            return True
+        return False
+
+    def handle_registration(self, data, interface, info=None, addr=None, parsed=None):
+        header, url_entries, encoded_url_entry, msg = parse.parse_encoded_registration(data, parsed)
+        if info is not None:
+            self.hook('body', time.monotonic(), info)
+
+        if self.out_of_scope(msg['scope_list'], interface):
+            return self.create_error_reply(data, parse.SCOPE_NOT_SUPPORTED)
+
+        registry = self.registries[interface]
+        evictions = registry.evictions
+        try:
+            deadline = registry.add(
+                service_type=msg['service_type'],
+                url=url_entries['url'],
+                lifetime=url_entries['lifetime'],
+                attr_list=msg['attr_list'],
+                source=None if addr is None else addr[0],
+                url_entry=encoded_url_entry
+            )
+        except RegistryError as e:
+            self.metrics.inc('pyslp_slpd_rejected_total', interface=interface)
+            # in scope, so the refusal is acknowledged even to a multicast SrvReg rather than left to time out
+            return creator.create_error_reply(header['function_id'], header['xid'], e.error_code)
+        if registry.evictions != evictions:
+            self.metrics.inc('pyslp_slpd_evicted_total', registry.evictions - evictions, interface=interface)
+        if deadline is not None:
+            self.schedule_expiry(deadline)
+        if self.observers:
+            self.notify('register', interface, dict(
+                service_type=msg['service_type'],
+                url=url_entries['url'],
+                lifetime=url_entries['lifetime'],
+                attr_list=msg['attr_list'].decode()
+            ))
+        if info is not None:
+            self.hook('lookup', time.monotonic(), info)
+
+        response = creator.create_acknowledge(xid=header['xid'])
+        if info is not None:
+            self.hook('encode', time.monotonic(), info)
+        return response
+
+    def handle_request(self, data, interface, info=None, addr=None, parsed=None):
+        header, msg = parse.parse_request(data, parsed)
+        if info is not None:
+            self.hook('body', time.monotonic(), info)
+
+        if self.out_of_scope(msg['scope_list'], interface):
+            return self.create_error_reply(data, parse.SCOPE_NOT_SUPPORTED)
+
+        if self.previous_responder(msg['pr_list'], interface):
+            return None
+
+        service_type = msg['service_type']
+        registry = self.registries[interface]
+        # the type comes from the network, so only registered ones get a series of their own
+        known = service_type in registry.services or (self.da and service_type == 'service:directory-agent')
+        self.metrics.inc('pyslp_slpd_service_type_requests_total', service_type=service_type if known else 'other')
+
+        if self.da and service_type == 'service:directory-agent':
+            return self.create_da_advert(interface, xid=header['xid'])
+
+        if self.max_results and len(registry.services.get(service_type, ())) > self.max_results:
+            urls = self.selection.select(registry, service_type, self.max_results)
+            url_entries = registry.encoded_url_entries(service_type, urls)
+            self.metrics.inc('pyslp_slpd_limited_replies_total')
+        else:
+            url_entries = registry.encoded_url_entries(service_type)
+        if info is not None:
+            self.hook('lookup', time.monotonic(), info)
+        if not url_entries and self.drop_empty(data):
+            return None
+
+        response = creator.create_encoded_reply(
+            xid=header['xid'],
+            url_entries=url_entries
+        )
+        if info is not None:
+            self.hook('encode', time.monotonic(), info)
+        return response
+
+    def handle_attr_request(self, data, interface, info=None, addr=None, parsed=None):
+        header, msg = parse.parse_attr_request(data, parsed)
+        if info is not None:
+            self.hook('body', time.monotonic(), info)
+
+        if self.out_of_scope(msg['scope_list'], interface):
+            return self.create_error_reply(data, parse.SCOPE_NOT_SUPPORTED)
+
+        if self.previous_responder(msg['pr_list'], interface):
+            return None
+
+        url = msg['url']
+
+        attr_list = b''
+        url_entry = self.registries[interface].get(url)
+        if url_entry is not None:
+            attr_list = url_entry['attrs']
+        if info is not None:
+            self.hook('lookup', time.monotonic(), info)
+        if url_entry is None and self.drop_empty(data):
+            return None
+
+        response = creator.create_attr_reply(
+            xid=header['xid'],
+            attr_list=attr_list
+        )
+        if info is not None:
+            self.hook('encode', time.monotonic(), info)
+        return response
+
+    def handle_srv_type_request(self, data, interface, info=None, addr=None, parsed=None):
+        header, msg = parse.parse_srv_type_request(data, parsed)
+        if info is not None:
+            self.hook('body', time.monotonic(), info)
+
+        if self.out_of_scope(msg['scope_list'], interface):
+            return self.create_error_reply(data, parse.SCOPE_NOT_SUPPORTED)
+
+        if self.previous_responder(msg['pr_list'], interface):
+            return None
+
+        service_types = self.registries[interface].service_types(msg['naming_authority'])
+        if info is not None:
+            self.hook('lookup', time.monotonic(), info)
+        if not service_types and self.drop_empty(data):
+            return None
+
+        response = creator.create_srv_type_reply(
+            xid=header['xid'],
+            service_types=service_types
+        )
+        if info is not None:
+            self.hook('encode', time.monotonic(), info)
+        return response
+
+    def handle_deregistration(self, data, interface, info=None, addr=None, parsed=None):
+        header, url_entry, scope_list = parse.parse_deregistration(data, parsed)
+        if info is not None:
+            self.hook('body', time.monotonic(), info)
+
+        if self.out_of_scope(scope_list, interface):
+            return self.create_error_reply(data, parse.SCOPE_NOT_SUPPORTED)
+
+        self.remove(interface, url_entry['url'])
+        if self.observers:
+            self.notify('deregister', interface, dict(url=url_entry['url']))
+        if info is not None:
+            self.hook('lookup', time.monotonic(), info)
+
+        response = creator.create_acknowledge(xid=header['xid'])
+        if info is not None:
+            self.hook('encode', time.monotonic(), info)
+        return response
 
     def close(self):
-        self.flag_continue = False
+        for handle in [self.expiry_handle, self.da_heartbeat_handle]:
+            if handle is not None:
+                handle.cancel()
+        self.expiry_handle = self.da_heartbeat_handle = None
+
         for transport in self.transports:
             transport.close()
+        self.transports = list()
+        self.listeners = dict()
+        self.pktinfo_transport = None
+        self.ip_addrs = list()
 
 
 class Receiver(asyncio.DatagramProtocol):
@@ -168,32 +548,25 @@ class Receiver(asyncio.DatagramProtocol):
 
     def connection_made(self, transport):
         self.transport = transport
-        self.slpd.connection_made(transport)
+        self.slpd.connection_made(transport, self.ip_addr)
 
     def datagram_received(self, data, addr):
         self.slpd.datagram_received(data, addr, self.ip_addr, self.transport)
 
 
-@asyncio.coroutine
-def create_slpd(ip_addrs, mcast_port=427, mcast_group='239.255.255.253', loop=None, scope='DEFAULT'):
+async def create_slpd(ip_addrs, mcast_port=427, mcast_group='239.255.255.253', loop=None, scope='DEFAULT',
+                metrics=None, hook=None, da=False, batch_size=None, pktinfo=False, network=multicast,
+                limits=None, max_results=None, selection=None):
     ip_addrs = get_lst(ip_addrs)
-    slpd = SLPDServer(scope=scope)
-    loop = loop or asyncio.get_event_loop()
-    asyncio.run_coroutine_threadsafe(
-        slpd.update(
-            ip_addrs=ip_addrs,
-            mcast_port=mcast_port,
-            mcast_group=mcast_group
-        ),
-        loop
+    slpd = SLPDServer(
+        scope=scope, metrics=metrics, hook=hook, da=da, batch_size=batch_size, pktinfo=pktinfo,
+        mcast_port=mcast_port, mcast_group=mcast_group, loop=loop, network=network,
+        limits=limits, max_results=max_results, selection=selection
     )
+    await slpd.update(ip_addrs)
     return slpd
 
 
 if __name__ == '__main__':
-    loop = asyncio.get_event_loop()
-    ip_addrs = ['127.0.0.1']
-    if ip_addrs is None:
-        raise Exception('You should set ip address')
-    loop.run_until_complete(create_slpd(ip_addrs))
-    loop.run_forever()
+    from pyslp.cli import slpd_main
+    slpd_main()
@@ -1,96 +1,297 @@
 # -*- coding: utf-8 -*-
 
+import time
 import asyncio
-from concurrent.futures import FIRST_COMPLETED, ALL_COMPLETED
+import functools
+import threading
+from concurrent.futures import ALL_COMPLETED, TimeoutError as FutureTimeoutError
 
 from pyslp.utils import get_lst
+from pyslp.metrics import Metrics
+from pyslp.sa import create_service_agent
 from pyslp import multicast, creator, parse
 
+# messages that carry the REQUEST MCAST flag when sent to the multicast group, so that
+# agents of other scopes drop them instead of answering with an error
+MCAST_REQUESTS = (1, 3, 4, 6, 9)
+# multicast requests whose replies are gathered from every agent, RFC 2608 section 6.3
+CONVERGENCE_REQUESTS = (1, 6, 9)
+
 
 class SLPClientError(Exception):
     pass
 
 
+def merge_replies(replies):
+    # one result out of the replies of every agent: URLs and service types are joined,
+    # the first non-empty attribute list wins and errors only count if nobody succeeded
+    results = list()
+    seen = set()
+    for addr, reply in replies:
+        if addr[0] not in seen:
+            seen.add(addr[0])
+            results.append(reply)
+    succeeded = [reply for reply in results if not reply['error_code']]
+    if not succeeded:
+        return results[0] if results else dict()
+
+    result = dict(succeeded[0])
+    if 'url_entries' in result:
+        url_entries = {url_entry['url']: url_entry for reply in succeeded for url_entry in reply.get('url_entries', ())}
+        result['url_entries'] = list(url_entries.values())
+    if 'service_types' in result:
+        result['service_types'] = list(dict.fromkeys(
+            service_type for reply in succeeded for service_type in reply.get('service_types', ())
+        ))
+    if 'attr_list' in result:
+        result['attr_list'] = next((reply['attr_list'] for reply in succeeded if reply.get('attr_list')), '')
+    return result
+
+
 class Receiver(asyncio.DatagramProtocol):
 
-    def __init__(self, event=None, result=None):
+    def __init__(self, event=None, result=None, hook=None, info=None, replies=None):
         self.event = event
         self.result = result
+        self.hook = hook
+        self.info = info
+        # with a replies list every reply is kept as (addr, reply) instead of updating result
+        self.replies = replies
 
     def connection_made(self, transport):
         self.transport = transport
 
     def datagram_received(self, data, addr):
-        header, _ = parse.parse_header(data)
-        if header['function_id'] == 2:
-            _, error_code, url_entries = parse.parse_reply(data)
-            self.result.update(
-                dict(
+        hook = self.hook
+        if hook is not None:
+            hook('receive', time.monotonic(), self.info)
+        try:
+            parsed = parse.parse_header(data)
+            header = parsed[0]
+            if hook is not None:
+                hook('header', time.monotonic(), self.info)
+            if header['function_id'] == 2:
+                _, error_code, url_entries = parse.parse_reply(data, parsed)
+                reply = dict(
                     error_code=error_code,
                     url_entries=url_entries
                 )
-            )
-        elif header['function_id'] == 5:
-            _, error_code = parse.parse_acknowledge(data)
-            self.result.update(
-                dict(
+            elif header['function_id'] == 5:
+                _, error_code = parse.parse_acknowledge(data, parsed)
+                reply = dict(
                     error_code=error_code
                 )
-            )
-        elif header['function_id'] == 7:
-            _, error_code, attr_list = parse.parse_attr_reply(data)
-            self.result.update(
-                dict(
+            elif header['function_id'] == 7:
+                _, error_code, attr_list = parse.parse_attr_reply(data, parsed)
+                reply = dict(
                     error_code=error_code,
                     attr_list=attr_list
                 )
-            )
-
+            elif header['function_id'] == 10:
+                _, error_code, service_types = parse.parse_srv_type_reply(data, parsed)
+                reply = dict(
+                    error_code=error_code,
+                    service_types=service_types
+                )
+            else:
+                return
+        except (IndexError, ValueError):
+            return
+
+        if hook is not None:
+            hook('body', time.monotonic(), self.info)
+        if self.replies is not None:
+            self.replies.append((addr, reply))
+        else:
+            self.result.update(reply)
         self.event.set()
 
 
+class Dispatcher(asyncio.DatagramProtocol):
+    # one socket shared by concurrent requests, replies are routed by xid
+
+    def __init__(self):
+        self.transport = None
+        self.receivers = dict()
+        self.xid = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def register(self, receiver):
+        for _ in range(0x10000):
+            self.xid = (self.xid + 1) & 0xFFFF
+            if self.xid not in self.receivers:
+                self.receivers[self.xid] = receiver
+                return self.xid
+        raise SLPClientError('Too many requests in flight')
+
+    def unregister(self, xid):
+        self.receivers.pop(xid, None)
+
+    def datagram_received(self, data, addr):
+        if len(data) < parse.HEADER_LENGTH:
+            return
+        receiver = self.receivers.get(data[10] << 8 | data[11])
+        if receiver is not None:
+            receiver.datagram_received(data, addr)
+
+
+class DAAdvertReceiver(asyncio.DatagramProtocol):
+
+    def __init__(self, da_adverts):
+        self.da_adverts = da_adverts
+
+    def datagram_received(self, data, addr):
+        try:
+            parsed = parse.parse_header(data)
+            if parsed[0]['function_id'] != 8:
+                return
+            _, error_code, da_advert = parse.parse_da_advert(data, parsed)
+        except (IndexError, ValueError):
+            return
+        if error_code == 0 and da_advert['boot_timestamp'] != 0:
+            self.da_adverts.append(da_advert)
+
+
 class SLPClient:
 
-    def __init__(self, ip_addrs, mcast_group='239.255.255.253', mcast_port=427, loop=None, scope='DEFAULT'):
+    def __init__(self, ip_addrs, mcast_group='239.255.255.253', mcast_port=427, loop=None, scope='DEFAULT',
+                 metrics=None, hook=None, da_addrs=None, network=multicast, timeout=1, reuse_sockets=False,
+                 convergence_wait=None):
         self.ip_addrs = get_lst(ip_addrs)
         self.mcast_group = mcast_group
         self.mcast_port = mcast_port
         self.scope = scope
 
-        self.loop = loop or asyncio.get_event_loop()
-
-    @asyncio.coroutine
-    def _send(self, ip_addr, data):
-        mcast_transport = yield from multicast.create_sender(
-            asyncio.DatagramProtocol, ip_addr, 0
-        )
+        self.loop = loop
+        self.metrics = metrics or Metrics()
+        self.hook = hook
+        self.da_addrs = dict(da_addrs or {})
+        self.network = network
+        self.timeout = timeout
+        self.reuse_sockets = reuse_sockets
+        self.convergence_wait = convergence_wait
+        self.dispatchers = dict()
+        self.service_agent = None
+
+    async def _create_dispatcher(self, ip_addr):
+        dispatcher = Dispatcher()
+        await self.network.create_sender(lambda: dispatcher, ip_addr, 0, loop=self.loop)
+        return dispatcher
+
+    async def _dispatcher(self, ip_addr):
+        task = self.dispatchers.get(ip_addr)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self.dispatchers[ip_addr] = asyncio.ensure_future(self._create_dispatcher(ip_addr))
+        return await task
+
+    async def start_service_agent(self):
+        # from now on register/deregister go to an embedded SA instead of slpd
+        if self.service_agent is None:
+            self.service_agent = await create_service_agent(
+                self.ip_addrs, mcast_port=self.mcast_port, mcast_group=self.mcast_group, loop=self.loop,
+                scope=self.scope, metrics=self.metrics, hook=self.hook, network=self.network
+            )
+        return self.service_agent
+
+    def close(self):
+        if self.service_agent is not None:
+            self.service_agent.close()
+            self.service_agent = None
+        for task in self.dispatchers.values():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                task.result().transport.close()
+            else:
+                task.cancel()
+        self.dispatchers = dict()
+
+    async def _send(self, ip_addr, data):
+        function = parse.FUNCTION_NAMES.get(data[1], str(data[1]))
+        self.metrics.inc('pyslp_client_requests_total', function=function, interface=ip_addr)
+        start = time.monotonic()
+        event = asyncio.Event()
+        result = dict()
+        info = None
+        if self.hook is not None:
+            info = dict(interface=ip_addr, function=function)
+        da_addr = self.da_addrs.get(ip_addr)
+        # with convergence_wait set, replies are gathered from every agent instead of taking the first
+        converge = self.convergence_wait is not None and da_addr is None and data[1] in CONVERGENCE_REQUESTS
+        replies = list() if converge else None
+        receiver = Receiver(event, result, self.hook, info, replies)
+        if da_addr is None and data[1] in MCAST_REQUESTS:
+            data = data[:5] + bytes([data[5] | parse.FLAG_MCAST]) + data[6:]
+        if self.reuse_sockets:
+            dispatcher = await self._dispatcher(ip_addr)
+            xid = dispatcher.register(receiver)
+            data = data[:10] + xid.to_bytes(2, byteorder='big') + data[12:]
+            transport = dispatcher.transport
+            release = functools.partial(dispatcher.unregister, xid)
+        else:
+            transport = await self.network.create_sender(lambda: receiver, ip_addr, 0, loop=self.loop)
+            release = transport.close
+        if info is not None:
+            info['xid'] = parse.convert_to_int(data[10:12])
         try:
-            event = asyncio.Event()
-            result = dict()
-            transport, _ = yield from self.loop.create_datagram_endpoint(
-                lambda: Receiver(event, result), sock=mcast_transport._sock
+            if replies is not None:
+                result = await self._converge(transport, data, replies, info)
+                done = bool(result)
+            else:
+                transport.sendto(data, (da_addr or self.mcast_group, self.mcast_port))
+                if info is not None:
+                    self.hook('send', time.monotonic(), info)
+                try:
+                    done = await asyncio.wait_for(event.wait(), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    done = False
+            if not (done or result):
+                self.metrics.inc('pyslp_client_timeouts_total', function=function, interface=ip_addr)
+                raise SLPClientError('Internal error')
+            if result.get('error_code'):
+                self.metrics.inc('pyslp_client_errors_total', function=function, interface=ip_addr)
+            self.metrics.observe(
+                'pyslp_client_latency_seconds', time.monotonic() - start,
+                function=function, interface=ip_addr
             )
-            mcast_transport.sendto(data, (self.mcast_group, self.mcast_port))
-            try:
-                done, pending = yield from asyncio.wait([event.wait()], timeout=1, return_when=FIRST_COMPLETED)
-                for f in pending:
-                    f.cancel()
-                if not (done or result):
-                    raise SLPClientError('Internal error')
-                transport.close()
-                return result
-            finally:
-                transport.close()
+            return result
         finally:
-            mcast_transport.close()
+            release()
+
+    async def _converge(self, transport, data, replies, info):
+        # the request is retransmitted with the agents that have answered in its PRList
+        # until a round brings no new ones or the timeout runs out
+        addr = (self.mcast_group, self.mcast_port)
+        deadline = time.monotonic() + self.timeout
+        responders = list()
+        while True:
+            transport.sendto(data, addr)
+            if info is not None:
+                self.hook('send', time.monotonic(), info)
+            await asyncio.sleep(max(0, min(deadline, time.monotonic() + self.convergence_wait) - time.monotonic()))
+
+            new = [reply_addr[0] for reply_addr, _ in replies if reply_addr[0] not in responders]
+            responders.extend(dict.fromkeys(new))
+            if (responders and not new) or time.monotonic() >= deadline:
+                break
+            if new:
+                self.metrics.inc('pyslp_client_retransmissions_total', function=parse.FUNCTION_NAMES[data[1]])
+                data = creator.set_pr_list(data, ','.join(responders))
+        return merge_replies(replies)
 
-    @asyncio.coroutine
-    def _wait(self, fs):
+    async def _wait(self, fs):
+        fs = [asyncio.ensure_future(f) for f in fs]
         flag_completed = False
+        error_code = None
 
         timeout = 5
         while not flag_completed:
-            done, pending = yield from asyncio.wait(fs, timeout=timeout, return_when=ALL_COMPLETED)
+            try:
+                done, pending = await asyncio.wait(fs, timeout=timeout, return_when=ALL_COMPLETED)
+            except asyncio.CancelledError:
+                for f in fs:
+                    f.cancel()
+                raise
 
             if not done:
                 for f in pending:
@@ -113,18 +314,47 @@ class SLPClient:
                 break
 
             if pending:
+                self.metrics.inc('pyslp_client_retries_total')
                 fs = list(pending)
             else:
                 try:
                     result = done.pop().result()  # raise exception
                     if not pending:
                         raise SLPClientError('SLP error code: {}'.format(error_code))
+                except SLPClientError:
+                    raise
                 except:
                     raise SLPClientError('SLP error code: {}'.format(error_code))
 
         return result
 
-    def send(self, data, ip_addr=None):
+    async def _discover_da(self, ip_addr, data, timeout):
+        da_adverts = list()
+        transport = await self.network.create_sender(
+            lambda: DAAdvertReceiver(da_adverts), ip_addr, 0, loop=self.loop
+        )
+        try:
+            transport.sendto(data, (self.mcast_group, self.mcast_port))
+            await asyncio.sleep(timeout)
+        finally:
+            transport.close()
+
+        for da_advert in da_adverts:
+            if da_advert['scope_list'] == self.scope:
+                self.da_addrs[ip_addr] = da_advert['url'].split('://', 1)[-1].split('/')[0].split(':')[0]
+                break
+
+    async def discover_das(self, timeout=1):
+        data = creator.create_request(
+            service_type='service:directory-agent',
+            scope_list=self.scope
+        )
+        await asyncio.gather(
+            *[self._discover_da(ip_addr, data, timeout) for ip_addr in self.ip_addrs]
+        )
+        return dict(self.da_addrs)
+
+    async def send(self, data, ip_addr=None):
         fs = list()
         if ip_addr is not None:
             fs.append(self._send(ip_addr, data))
@@ -132,10 +362,12 @@ class SLPClient:
             for ip_addr in self.ip_addrs:
                 fs.append(self._send(ip_addr, data))
 
-        return (yield from self._wait(fs))
+        return (await self._wait(fs))
 
-    @asyncio.coroutine
-    def register(self, service_type, url, attr_list='', lifetime=65535):
+    async def register(self, service_type, url, attr_list='', lifetime=65535):
+        if self.service_agent is not None:
+            self.service_agent.register(service_type, url, attr_list=attr_list, lifetime=lifetime)
+            return
         data = creator.create_registration(
             service_type=service_type,
             scope_list=self.scope,
@@ -143,15 +375,16 @@ class SLPClient:
             lifetime=lifetime,
             url=url
         )
-        yield from self.send(data)
+        await self.send(data)
 
-    @asyncio.coroutine
-    def deregister(self, url):
+    async def deregister(self, url):
+        if self.service_agent is not None:
+            self.service_agent.deregister(url)
+            return
         data = creator.create_deregistration(url=url, scope_list=self.scope)
-        yield from self.send(data)
+        await self.send(data)
 
-    @asyncio.coroutine
-    def findsrvs(self, service_type):
+    async def findsrvs(self, service_type):
         data = creator.create_request(
             service_type=service_type,
             scope_list=self.scope
@@ -161,8 +394,8 @@ class SLPClient:
         addrs = list()
         for ip_addr in self.ip_addrs:
             try:
-                result = yield from self.send(data, ip_addr)
-            except:
+                result = await self.send(data, ip_addr)
+            except Exception:
                 continue
             url_entries.append([entry['url'] for entry in result['url_entries']])
             addrs.append(ip_addr)
@@ -170,8 +403,26 @@ class SLPClient:
             raise SLPClientError('Internal error')
         return url_entries, addrs
 
-    @asyncio.coroutine
-    def findattrs(self, url, ip_addrs=None):
+    async def findsrvtypes(self, naming_authority=None):
+        data = creator.create_srv_type_request(
+            naming_authority=naming_authority,
+            scope_list=self.scope
+        )
+        service_types = list()
+
+        addrs = list()
+        for ip_addr in self.ip_addrs:
+            try:
+                result = await self.send(data, ip_addr)
+            except Exception:
+                continue
+            service_types.append(result['service_types'])
+            addrs.append(ip_addr)
+        if not service_types:
+            raise SLPClientError('Internal error')
+        return service_types, addrs
+
+    async def findattrs(self, url, ip_addrs=None):
         data = creator.create_attr_request(
             url=url,
             scope_list=self.scope
@@ -185,10 +436,10 @@ class SLPClient:
 
         for ip_addr in addrs:
             try:
-                result = yield from self.send(data, ip_addr)
+                result = await self.send(data, ip_addr)
                 if result['attr_list'] != '':
                     return result['attr_list']
-            except:
+            except Exception:
                 flag_error = True
 
         if flag_error:
@@ -196,36 +447,79 @@ class SLPClient:
 
         return list()
 
+
+class SyncSLPClient:
+    # an SLPClient on its own loop in a daemon thread, callable from any thread
+
+    def __init__(self, ip_addrs, timeout=None, loop_factory=asyncio.new_event_loop, **kwargs):
+        self.timeout = timeout
+        self.loop = loop_factory()
+        self.thread = threading.Thread(target=self._run, name='pyslp-client', daemon=True)
+        self.thread.start()
+        kwargs.setdefault('reuse_sockets', True)
+        self.client = SLPClient(ip_addrs, loop=self.loop, **kwargs)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def result(self, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # otherwise the request keeps its xid and socket on the loop until its own timeout
+            future.cancel()
+            raise
+
+    def register_future(self, service_type, url, attr_list='', lifetime=65535):
+        return self.submit(self.client.register(service_type, url, attr_list=attr_list, lifetime=lifetime))
+
+    def deregister_future(self, url):
+        return self.submit(self.client.deregister(url))
+
+    def findsrvs_future(self, service_type):
+        return self.submit(self.client.findsrvs(service_type))
+
+    def findattrs_future(self, url, ip_addrs=None):
+        return self.submit(self.client.findattrs(url, ip_addrs=ip_addrs))
+
+    def findsrvtypes_future(self, naming_authority=None):
+        return self.submit(self.client.findsrvtypes(naming_authority))
+
+    def register(self, service_type, url, attr_list='', lifetime=65535):
+        return self.result(self.register_future(service_type, url, attr_list=attr_list, lifetime=lifetime))
+
+    def deregister(self, url):
+        return self.result(self.deregister_future(url))
+
+    def findsrvs(self, service_type):
+        return self.result(self.findsrvs_future(service_type))
+
+    def findattrs(self, url, ip_addrs=None):
+        return self.result(self.findattrs_future(url, ip_addrs=ip_addrs))
+
+    def findsrvtypes(self, naming_authority=None):
+        return self.result(self.findsrvtypes_future(naming_authority))
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.client.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 if __name__ == '__main__':
-    for _ in range(10):
-        loop = asyncio.get_event_loop()
-        ip_addrs = '127.0.0.1'
-        if ip_addrs is None:
-            raise Exception('You should set ip address')
-        slp_client = SLPClient(ip_addrs=ip_addrs)
-        service_type = 'service:test'
-        for url in ['service:test://test.com', 'service:test://test_1.com']:
-            loop.run_until_complete(
-                slp_client.register(
-                    service_type=service_type,
-                    lifetime=15,
-                    url=url,
-                    attr_list=''
-                )
-            )
-            print('{} - service is registered successfully'.format(url))
-        url_entries = loop.run_until_complete(
-            slp_client.findsrvs(service_type=service_type)
-        )
-        print(url_entries)
-        print('findsrvs for {} - {}'.format(service_type, url_entries))
-        for _url_entries in url_entries[0]:
-            for url in _url_entries:
-                attr_list = loop.run_until_complete(
-                    slp_client.findattrs(url=url)
-                )
-                print('findattrs for {} - {}'.format(url, attr_list))
-                loop.run_until_complete(
-                    slp_client.deregister(url=url)
-                )
-                print('{} - service is deregistered successfully'.format(url))
+    import sys
+    from pyslp.cli import tool_main
+    sys.exit(tool_main())
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+import os
+import asyncio
+
+# PYSLP_TEST_LOOP=uvloop runs the suite on uvloop: every test makes its loop with asyncio.new_event_loop()
+if os.environ.get('PYSLP_TEST_LOOP') == 'uvloop':
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
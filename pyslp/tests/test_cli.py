@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import asyncio
+import argparse
+import unittest
+
+from pyslp.cli import parse_command, parse_limits, run_batch
+from pyslp.loopback import LoopbackNetwork
+from pyslp.slpd import create_slpd
+from pyslp.slptool import SLPClient
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.slpd = self.loop.run_until_complete(create_slpd('10.0.0.1', network=self.network))
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, timeout=0.1, reuse_sockets=True)
+
+    def tearDown(self):
+        self.slp_client.close()
+        self.slpd.close()
+        self.loop.close()
+
+    def run_batch(self, lines):
+        output = io.StringIO()
+        failed = self.loop.run_until_complete(run_batch(self.slp_client, lines, output))
+        records = {record['id']: record for record in map(json.loads, output.getvalue().splitlines())}
+        return failed, records
+
+    def test_parse_command(self):
+        self.assertDictEqual(
+            dict(command='register', service_type='service:test', url='service:test://a', attr_list='(a=1)',
+                 lifetime=15),
+            parse_command("register service:test service:test://a '(a=1)' 15")
+        )
+        self.assertDictEqual(dict(command='findsrvtypes'), parse_command('findsrvtypes'))
+        self.assertDictEqual(
+            dict(command='findsrvs', service_type='service:test', id='x'),
+            parse_command('{"command": "findsrvs", "service_type": "service:test", "id": "x"}')
+        )
+        with self.assertRaises(ValueError):
+            parse_command('findsrvs')
+        with self.assertRaises(ValueError):
+            parse_command('unknown service:test')
+
+    def test_parse_limits(self):
+        self.assertDictEqual(dict(max_entries=10, eviction=None), parse_limits('max_entries=10, eviction=none'))
+        self.assertDictEqual(dict(eviction='lru'), parse_limits('eviction=lru'))
+        for value in ['foo=1', 'eviction=oldest', 'max_entries=many', 'max_entries']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_limits(value)
+
+    def test_batch(self):
+        urls = ['service:test://host_{}'.format(i) for i in range(20)]
+        failed, records = self.run_batch(
+            ['# registrations\n'] + ['register service:test {} (weight=1)\n'.format(url) for url in urls] + ['\n']
+        )
+        self.assertEqual(0, failed)
+        self.assertEqual(20, len(records))
+        self.assertEqual(20, len(self.slpd.registry('10.0.0.1')))
+
+        failed, records = self.run_batch([
+            'findsrvs service:test\n',
+            'findattrs service:test://host_0\n',
+            '{"command": "findsrvtypes", "id": "types"}\n',
+            'frobnicate\n',
+        ])
+        self.assertEqual(1, failed)
+        self.assertSetEqual(set(urls), set(records[1]['result']['urls'][0]))
+        self.assertEqual('(weight=1)', records[2]['result']['attr_list'])
+        self.assertListEqual(['service:test'], records['types']['result']['service_types'][0])
+        self.assertIn('error', records[4])
+
+        failed, _ = self.run_batch(['deregister {}\n'.format(url) for url in urls])
+        self.assertEqual(0, failed)
+        self.assertEqual(0, len(self.slpd.registry('10.0.0.1')))
+        self.assertEqual(1, len(self.slp_client.dispatchers))
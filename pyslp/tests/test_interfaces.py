@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import asyncio
+import unittest
+
+from pyslp import interfaces
+from pyslp.slpd import SLPDServer
+from pyslp.interfaces import InterfaceWatcher
+
+
+def create_addr_message(msg_type, ip_addr):
+    attr = interfaces.RTATTR.pack(8, interfaces.IFA_LOCAL) + socket.inet_aton(ip_addr)
+    body = interfaces.IFADDRMSG.pack(socket.AF_INET, 8, 0, 0, 1) + attr
+    return interfaces.NLMSGHDR.pack(interfaces.NLMSGHDR.size + len(body), msg_type, 0, 0, 0) + body
+
+
+class TestInterfaces(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.close()
+
+    def test_parse_netlink_addrs(self):
+        data = create_addr_message(interfaces.RTM_NEWADDR, '10.0.0.1')
+        data += create_addr_message(interfaces.RTM_DELADDR, '10.0.0.2')
+        data += interfaces.NLMSGHDR.pack(interfaces.NLMSGHDR.size, interfaces.NLMSG_DONE, 0, 0, 0)
+        addrs, done = interfaces.parse_netlink_addrs(data)
+        self.assertTrue(done)
+        self.assertListEqual(
+            [(interfaces.RTM_NEWADDR, '10.0.0.1'), (interfaces.RTM_DELADDR, '10.0.0.2')],
+            addrs
+        )
+
+    def test_watcher(self):
+        slpd = SLPDServer(mcast_port=4272)
+        ip_addrs = ['127.0.0.1', '127.0.0.2']
+        watcher = InterfaceWatcher(slpd, get_ip_addrs=lambda: ip_addrs, interval=0.1, netlink=False)
+        try:
+            self.loop.run_until_complete(watcher.start())
+            self.assertListEqual(['127.0.0.1', '127.0.0.2'], slpd.ip_addrs)
+
+            ip_addrs = ['127.0.0.2']
+            self.loop.run_until_complete(asyncio.sleep(0.3))
+            self.assertListEqual(['127.0.0.2'], slpd.ip_addrs)
+            self.assertListEqual(['127.0.0.2'], list(slpd.registries))
+        finally:
+            watcher.close()
+            slpd.close()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+import time
+import errno
+import asyncio
+import unittest
+
+from pyslp import creator, parse
+from pyslp.slpd import create_slpd
+from pyslp.loopback import LoopbackNetwork
+from pyslp.slptool import SLPClient, SLPClientError
+
+
+class Collector(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        self.received = list()
+
+    def datagram_received(self, data, addr):
+        self.received.append((data, addr))
+
+
+class TestLoopbackNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_multicast_and_unicast(self):
+        network = LoopbackNetwork()
+
+        async def run():
+            members = [Collector() for _ in range(3)]
+            for i, member in enumerate(members):
+                await network.create_listener(lambda: member, '10.0.0.{}'.format(i + 1), 427, '239.255.255.253')
+            sender = await network.create_sender(Collector, '10.0.1.1', 0)
+            sender.sendto(b'multicast', ('239.255.255.253', 427))
+            sender.sendto(b'unicast', ('10.0.0.2', 427))
+            await asyncio.sleep(0)
+            return members, sender.get_extra_info('sockname')
+
+        members, sockname = self.loop.run_until_complete(run())
+        self.assertEqual([(b'multicast', sockname)], members[0].received)
+        self.assertEqual([(b'multicast', sockname), (b'unicast', sockname)], members[1].received)
+        self.assertEqual(4, network.delivered)
+
+    def test_loss_and_reorder(self):
+        network = LoopbackNetwork(latency=0.001, loss=0.2, reorder=0.5, seed=1)
+
+        async def run():
+            receiver = Collector()
+            await network.create_unicast_listener(lambda: receiver, '10.0.0.1', 427)
+            sender = await network.create_sender(asyncio.DatagramProtocol, '10.0.0.2', 0)
+            for i in range(100):
+                sender.sendto(bytes([i]), ('10.0.0.1', 427))
+            await asyncio.sleep(0.05)
+            return [data[0] for data, _ in receiver.received]
+
+        received = self.loop.run_until_complete(run())
+        self.assertEqual(100, network.sent)
+        self.assertEqual(100 - network.dropped, len(received))
+        self.assertGreater(network.dropped, 0)
+        self.assertNotEqual(sorted(received), received)
+
+
+class TestLoopbackSLPD(unittest.TestCase):
+
+    batch_size = None
+    pktinfo = False
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.service_type = 'service:seliverstov'
+        self.slpd = self.loop.run_until_complete(
+            create_slpd('10.0.0.1', network=self.network, batch_size=self.batch_size, pktinfo=self.pktinfo)
+        )
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, timeout=0.1)
+
+    def tearDown(self):
+        self.slpd.close()
+        self.loop.close()
+
+    def test_register_and_find(self):
+        url = '{}://test.com'.format(self.service_type)
+        attr_list = '(attr1=value1)'
+        self.loop.run_until_complete(
+            self.slp_client.register(service_type=self.service_type, url=url, attr_list=attr_list)
+        )
+        urls, _ = self.loop.run_until_complete(self.slp_client.findsrvs(service_type=self.service_type))
+        self.assertEqual([url], urls[0])
+        attrs = self.loop.run_until_complete(self.slp_client.findattrs(url=url))
+        self.assertEqual(attr_list, attrs)
+
+        self.loop.run_until_complete(self.slp_client.deregister(url=url))
+        self.assertEqual(0, len(self.slpd.registry('10.0.0.1')))
+
+    def test_findsrvtypes(self):
+        for service_type in ['service:printer:lpr', 'service:printer.acme:lpr']:
+            self.loop.run_until_complete(
+                self.slp_client.register(service_type=service_type, url='{}://host'.format(service_type))
+            )
+        service_types, _ = self.loop.run_until_complete(self.slp_client.findsrvtypes())
+        self.assertSetEqual({'service:printer:lpr', 'service:printer.acme:lpr'}, set(service_types[0]))
+        service_types, _ = self.loop.run_until_complete(self.slp_client.findsrvtypes(naming_authority='acme'))
+        self.assertListEqual(['service:printer.acme:lpr'], service_types[0])
+        self.assertListEqual(['service:printer.acme:lpr'], self.slpd.service_types('acme'))
+
+    def test_first_reply(self):
+        # without convergence_wait a lookup returns on the first reply rather than after rounds
+        url = '{}://test.com'.format(self.service_type)
+        self.loop.run_until_complete(self.slp_client.register(service_type=self.service_type, url=url))
+        slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network)
+        for coro in [slp_client.findsrvs(self.service_type), slp_client.findsrvs('service:other'),
+                     slp_client.findattrs('service:other://test.com'), slp_client.findsrvtypes()]:
+            start = time.monotonic()
+            self.loop.run_until_complete(coro)
+            self.assertLess(time.monotonic() - start, 0.1)
+        self.assertIsNone(slp_client.metrics.get('pyslp_client_retransmissions_total', function='SrvRqst'))
+
+    def test_total_loss(self):
+        self.network.loss = 1
+        with self.assertRaises(SLPClientError):
+            self.loop.run_until_complete(self.slp_client.findsrvs(service_type=self.service_type))
+        self.assertGreater(self.network.dropped, 0)
+
+    def test_error_replies(self):
+        async def send(data):
+            receiver = Collector()
+            transport = await self.network.create_sender(lambda: receiver, '10.0.0.2', 0)
+            transport.sendto(data, ('10.0.0.1', 427))
+            await self.network.settle()
+            transport.close()
+            return [data for data, _ in receiver.received]
+
+        request = creator.create_request(service_type=self.service_type)
+        replies = self.loop.run_until_complete(send(b'\x01' + request[1:]))
+        self.assertEqual(1, len(replies))
+        self.assertEqual(parse.VER_NOT_SUPPORTED, parse.parse_reply(replies[0])[1])
+
+        replies = self.loop.run_until_complete(send(request[:-1]))
+        self.assertEqual(parse.PARSE_ERROR, parse.parse_reply(replies[0])[1])
+
+        registration = creator.create_registration(
+            service_type=self.service_type, scope_list='other', attr_list='', lifetime=15, url='service:test://x'
+        )
+        replies = self.loop.run_until_complete(send(registration))
+        self.assertEqual(parse.SCOPE_NOT_SUPPORTED, parse.parse_acknowledge(replies[0])[1])
+
+        # multicast requests and garbage are dropped without a reply
+        multicast = request[:5] + bytes([request[5] | parse.FLAG_MCAST]) + request[6:-1]
+        self.assertEqual([], self.loop.run_until_complete(send(multicast)))
+        self.assertEqual([], self.loop.run_until_complete(send(b'\xff' * 3)))
+
+
+class TestLoopbackScopes(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.slpds = [
+            self.loop.run_until_complete(create_slpd(ip_addr, network=self.network, scope=scope))
+            for ip_addr, scope in [('10.0.0.1', 'A'), ('10.0.0.3', 'B')]
+        ]
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, scope='A', timeout=0.1)
+
+    def tearDown(self):
+        for slpd in self.slpds:
+            slpd.close()
+        self.loop.close()
+
+    def test_other_scope_stays_quiet(self):
+        urls = ['service:seliverstov://host_{}'.format(i) for i in range(20)]
+        for url in urls:
+            self.loop.run_until_complete(self.slp_client.register(service_type='service:seliverstov', url=url))
+        self.assertEqual(20, len(self.slpds[0].registry('10.0.0.1')))
+        self.assertEqual(0, len(self.slpds[1].registry('10.0.0.3')))
+        for url in urls:
+            self.loop.run_until_complete(self.slp_client.deregister(url=url))
+        self.assertEqual(0, len(self.slpds[0].registry('10.0.0.1')))
+
+
+class TestLoopbackLimits(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.slpd = self.loop.run_until_complete(
+            create_slpd('10.0.0.1', network=self.network, limits=dict(max_entries=1, eviction=None))
+        )
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, timeout=0.1)
+
+    def tearDown(self):
+        self.slpd.close()
+        self.loop.close()
+
+    def test_refused_registration(self):
+        # the SrvReg goes out multicast, the refusal still comes back as an error SrvAck
+        self.loop.run_until_complete(self.slp_client.register('service:seliverstov', 'service:seliverstov://a'))
+        with self.assertRaisesRegex(SLPClientError, 'SLP error code: {}'.format(parse.INTERNAL_ERROR)):
+            self.loop.run_until_complete(self.slp_client.register('service:seliverstov', 'service:seliverstov://b'))
+        self.assertIsNone(self.slp_client.metrics.get(
+            'pyslp_client_timeouts_total', function='SrvReg', interface='10.0.0.2'
+        ))
+        self.assertEqual(1, self.slpd.metrics.get('pyslp_slpd_rejected_total', interface='10.0.0.1'))
+
+
+class VanishingNetwork(LoopbackNetwork):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gone = set()
+
+    async def create_sender(self, protocol_factory, ip_addr, port, loop=None):
+        if ip_addr in self.gone:
+            raise OSError(errno.EADDRNOTAVAIL, 'Cannot assign requested address')
+        return await super().create_sender(protocol_factory, ip_addr, port, loop=loop)
+
+
+class TestLoopbackDirectoryAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = VanishingNetwork(latency=0.001)
+        self.slpd = self.loop.run_until_complete(create_slpd(['10.0.0.1', '10.0.0.3'], network=self.network, da=True))
+
+    def tearDown(self):
+        self.slpd.close()
+        self.loop.close()
+
+    def test_remove_vanished_interface(self):
+        # the goodbye DAAdvert cannot be sent from an address that is gone, which must not stop the teardown
+        self.network.gone.add('10.0.0.1')
+        self.loop.run_until_complete(self.slpd.remove_interface('10.0.0.1'))
+        self.assertListEqual(['10.0.0.3'], self.slpd.ip_addrs)
+        self.assertNotIn('10.0.0.1', self.slpd.listeners)
+        self.assertNotIn('10.0.0.1', self.slpd.registries)
+        self.assertNotIn('10.0.0.1', self.slpd.da_adverts)
+        self.assertNotIn(('10.0.0.1', 427), self.network.listeners)
+
+        self.network.gone.clear()
+        self.loop.run_until_complete(self.slpd.update(['10.0.0.1', '10.0.0.3']))
+        self.assertIn('10.0.0.1', self.slpd.listeners)
+
+
+class TestLoopbackBatchSLPD(TestLoopbackSLPD):
+
+    batch_size = 16
+
+
+class TestLoopbackPktInfoSLPD(TestLoopbackSLPD):
+
+    pktinfo = True
+
+    def test_interfaces(self):
+        self.loop.run_until_complete(self.slpd.add_interface('10.0.0.3'))
+        self.assertListEqual(['10.0.0.1', '10.0.0.3'], self.slpd.ip_addrs)
+        self.loop.run_until_complete(self.slpd.remove_interface('10.0.0.1'))
+        self.assertNotIn(('10.0.0.1', 427), self.network.listeners)
+        self.assertIn(('10.0.0.3', 427), self.network.listeners)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from pyslp.metrics import Metrics, Histogram, create_metrics_server
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counters_and_gauges(self):
+        metrics = Metrics()
+        metrics.inc('requests_total', function='SrvRqst')
+        metrics.inc('requests_total', 2, function='SrvRqst')
+        metrics.set_gauge('registrations', 5, interface='127.0.0.1')
+        self.assertEqual(3, metrics.get('requests_total', function='SrvRqst'))
+        self.assertEqual(5, metrics.get('registrations', interface='127.0.0.1'))
+        self.assertIsNone(metrics.get('requests_total', function='SrvReg'))
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value)
+        self.assertEqual(4, histogram.count)
+        self.assertListEqual(
+            [(0.1, 2), (1, 3), (float('inf'), 4)],
+            histogram.cumulative()
+        )
+
+    def test_collector(self):
+        metrics = Metrics()
+        metrics.add_collector(lambda m: m.set_gauge('size', 7))
+        self.assertEqual(7, metrics.snapshot()['gauges'][('size', ())])
+
+    def test_render(self):
+        metrics = Metrics(buckets=(0.5,))
+        metrics.inc('requests_total', function='SrvRqst')
+        metrics.observe('latency_seconds', 0.1, function='SrvRqst')
+        text = metrics.render()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{function="SrvRqst"} 1', text)
+        self.assertIn('latency_seconds_bucket{function="SrvRqst",le="0.5"} 1', text)
+        self.assertIn('latency_seconds_bucket{function="SrvRqst",le="+Inf"} 1', text)
+        self.assertIn('latency_seconds_count{function="SrvRqst"} 1', text)
+
+    def test_metrics_server(self):
+        loop = asyncio.new_event_loop()
+        metrics = Metrics()
+        metrics.inc('requests_total')
+        server = loop.run_until_complete(create_metrics_server(metrics, '127.0.0.1', 0))
+        port = server.sockets[0].getsockname()[1]
+
+        async def fetch():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+            data = await reader.read()
+            writer.close()
+            return data
+
+        try:
+            data = loop.run_until_complete(fetch())
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+        self.assertTrue(data.startswith(b'HTTP/1.0 200 OK'))
+        self.assertIn(b'requests_total 1', data)
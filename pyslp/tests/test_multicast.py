@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 
 import uuid
+import errno
 import asyncio
 import unittest
 
 
-from pyslp.multicast import create_listener, create_sender
+from pyslp.multicast import create_listener, create_sender, create_batch_listener, create_pktinfo_listener
 
 
 class TestReceiver(asyncio.DatagramProtocol):
@@ -25,7 +26,13 @@ class TestReceiver(asyncio.DatagramProtocol):
 
 
 class TestMultiCast(unittest.TestCase):
-    loop = asyncio.get_event_loop()
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.close()
 
     def setUp(self):
         self.ip_addr = '127.0.0.1'
@@ -42,7 +49,7 @@ class TestMultiCast(unittest.TestCase):
                 self.mcast_group
             )
         )
-        port = transport._sock.getsockname()[1]
+        port = transport.get_extra_info('sockname')[1]
 
         transport = self.loop.run_until_complete(
             create_sender(
@@ -55,7 +62,103 @@ class TestMultiCast(unittest.TestCase):
         data = str(uuid.uuid1()).encode()
         transport.sendto(data, (self.mcast_group, port))
 
-        done, _ = self.loop.run_until_complete(asyncio.wait([event.wait()], timeout=1))
-        self.assertEqual(1, len(done))
+        self.loop.run_until_complete(asyncio.wait_for(event.wait(), timeout=1))
         self.assertEqual(1, len(data_info))
         self.assertEqual(data, data_info[0]['data'])
+
+    def test_batch_listener(self):
+        data_info = list()
+
+        def callback(data, addr, transport):
+            data_info.append(data)
+            transport.sendto(data, addr)
+
+        listener = self.loop.run_until_complete(
+            create_batch_listener(callback, self.ip_addr, 0, batch_size=4)
+        )
+        port = listener.get_extra_info('sockname')[1]
+
+        event = asyncio.Event()
+        replies = list()
+        transport = self.loop.run_until_complete(
+            create_sender(
+                lambda: TestReceiver(replies, event),
+                self.ip_addr, 0,
+            )
+        )
+        try:
+            messages = [str(i).encode() for i in range(10)]
+            for data in messages:
+                transport.sendto(data, (self.ip_addr, port))
+
+            for _ in range(10):
+                self.loop.run_until_complete(asyncio.sleep(0.05))
+                if len(replies) == len(messages):
+                    break
+        finally:
+            transport.close()
+            listener.close()
+
+        self.assertListEqual(messages, data_info)
+        self.assertListEqual(messages, [info['data'] for info in replies])
+
+    def test_send_errors(self):
+        listener = self.loop.run_until_complete(
+            create_batch_listener(lambda data, addr, transport: None, self.ip_addr, 0)
+        )
+        addr = listener.get_extra_info('sockname')
+        try:
+            # an oversized datagram is counted and does not hold up the ones behind it
+            listener.sendto(b'x' * 70000, addr)
+            listener.sendto(b'ok', addr)
+            listener.flush()
+            self.assertEqual(0, len(listener.pending))
+            self.assertDictEqual({'EMSGSIZE': 1}, dict(listener.send_errors))
+
+            def send(data, addr):
+                raise OSError(errno.ENOBUFS, 'No buffer space available')
+
+            listener._send = send
+            listener.sendto(b'ok', addr)
+            listener.flush()
+            self.assertEqual(0, len(listener.pending))
+            self.assertDictEqual({'EMSGSIZE': 1}, dict(listener.send_errors))
+        finally:
+            listener.close()
+
+    def test_pktinfo_listener(self):
+        ip_addrs = ['127.0.0.1', '127.0.0.2']
+        data_info = list()
+
+        def callback(data, addr, ip_addr, transport):
+            data_info.append((data, ip_addr))
+            transport.sendto(data, addr)
+
+        listener = self.loop.run_until_complete(
+            create_pktinfo_listener(callback, ip_addrs, 0, self.mcast_group)
+        )
+        port = listener.get_extra_info('sockname')[1]
+
+        event = asyncio.Event()
+        replies = list()
+        transport = self.loop.run_until_complete(
+            create_sender(
+                lambda: TestReceiver(replies, event),
+                self.ip_addr, 0,
+            )
+        )
+        try:
+            transport.sendto(b'unicast', ('127.0.0.2', port))
+            self.loop.run_until_complete(asyncio.wait_for(event.wait(), timeout=1))
+            event.clear()
+            transport.sendto(b'multicast', (self.mcast_group, port))
+            self.loop.run_until_complete(asyncio.wait_for(event.wait(), timeout=1))
+        finally:
+            transport.close()
+            listener.close()
+
+        self.assertEqual((b'unicast', '127.0.0.2'), data_info[0])
+        self.assertEqual(b'multicast', data_info[1][0])
+        self.assertIn(data_info[1][1], ip_addrs)
+        self.assertEqual(('127.0.0.2', port), replies[0]['addr'])
+        self.assertEqual(2, len(replies))
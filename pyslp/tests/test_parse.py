@@ -2,7 +2,7 @@
 
 import unittest
 
-from pyslp import parse
+from pyslp import parse, creator
 
 
 class TestMultiCast(unittest.TestCase):
@@ -34,6 +34,32 @@ class TestMultiCast(unittest.TestCase):
             )
         )
 
+    def test_parse_encoded_registration(self):
+        data = creator.create_registration(
+            service_type='service:test', scope_list='DEFAULT', attr_list='(attr=тест)', lifetime=15,
+            url='service:test://test.com'
+        )
+        header, url_entry, encoded_url_entry, msg = parse.parse_encoded_registration(data)
+        self.assertEqual(3, header['function_id'])
+        self.assertDictEqual(dict(lifetime=15, url='service:test://test.com'), url_entry)
+        self.assertEqual(creator.create_url_entry(15, 'service:test://test.com'), encoded_url_entry)
+        self.assertEqual('(attr=тест)'.encode(), msg['attr_list'])
+
+        # authentication blocks are not kept
+        _, header_length = parse.parse_header(data)
+        p = header_length + len(encoded_url_entry) - 1
+        auth_block = b'\x00\x02\x00\x0a' + b'\x00' * 6
+        body = data[header_length:p] + b'\x01' + auth_block + data[p + 1:]
+        data = creator.create_header(function_id=3, data_length=len(body), ofr=0, xid=1) + body
+        self.assertEqual(encoded_url_entry, parse.parse_encoded_registration(data)[2])
+
+        data = creator.create_registration(
+            service_type='service:test', scope_list='DEFAULT', attr_list='xxxxx', lifetime=15,
+            url='service:test://test.com'
+        )
+        with self.assertRaises(parse.ParseError):
+            parse.parse_encoded_registration(data.replace(b'xxxxx', b'\xff\xfe\xfd\xfc\xfb'))
+
     def test_parse_request(self):
         data = b'\x02\x01\x00\x00* \x00\x00\x00\x00&\x0c\x00\x02en\x00\x00\x00\x0cservice:test\x00\x04test\x00\x00\x00\x00'
         header, msg = parse.parse_request(data)
@@ -50,7 +76,8 @@ class TestMultiCast(unittest.TestCase):
         self.assertDictEqual(
             msg, dict(
                 service_type='service:test',
-                scope_list='test'
+                scope_list='test',
+                pr_list=''
             )
         )
 
@@ -92,7 +119,8 @@ class TestMultiCast(unittest.TestCase):
         self.assertDictEqual(
             msg, dict(
                 url='service:test://test.com',
-                scope_list='DEFAULT'
+                scope_list='DEFAULT',
+                pr_list=''
             )
         )
 
@@ -132,3 +160,81 @@ class TestMultiCast(unittest.TestCase):
             )
         )
         self.assertEqual(scope_list, 'DEFAULT')
+
+    def test_parse_da_advert(self):
+        data = creator.create_da_advert(
+            url='service:directory-agent://127.0.0.1',
+            scope_list='DEFAULT',
+            boot_timestamp=1500000000,
+            xid=12
+        )
+        header, error_code, da_advert = parse.parse_da_advert(data)
+        self.assertEqual(header['function_id'], 8)
+        self.assertEqual(header['xid'], 12)
+        self.assertEqual(header['length'], len(data))
+        self.assertEqual(error_code, 0)
+        self.assertDictEqual(
+            da_advert, dict(
+                boot_timestamp=1500000000,
+                url='service:directory-agent://127.0.0.1',
+                scope_list='DEFAULT',
+                attr_list=''
+            )
+        )
+
+    def test_check_header(self):
+        data = creator.create_request(service_type='service:test')
+        self.assertEqual(parse.check_header(data), 0)
+        self.assertEqual(parse.check_header(data[:10]), parse.PARSE_ERROR)
+        self.assertEqual(parse.check_header(b'\x01' + data[1:]), parse.VER_NOT_SUPPORTED)
+        self.assertEqual(parse.check_header(data[:1] + b'\x2a' + data[2:]), parse.MSG_NOT_SUPPORTED)
+        self.assertEqual(parse.check_header(data[:-1]), parse.PARSE_ERROR)
+        self.assertEqual(parse.check_header(data + b'\x00'), parse.PARSE_ERROR)
+        self.assertEqual(parse.check_header(data[:12] + b'\xff\xff' + data[14:]), parse.PARSE_ERROR)
+
+    def test_parsed_header(self):
+        data = creator.create_request(service_type='service:test', scope_list='DEFAULT')
+        parsed = parse.parse_header(data)
+        self.assertEqual(parse.parse_request(data), parse.parse_request(data, parsed))
+        # a header the caller has parsed already is not checked again
+        header, msg = parse.parse_request(b'\x01' + data[1:], parsed)
+        self.assertEqual(2, header['version'])
+        self.assertEqual('service:test', msg['service_type'])
+
+    def test_truncated_body(self):
+        data = creator.create_reply(xid=1, url_entries=[dict(url='service:test://test.com', lifetime=15)] * 3)
+        _, error_code, url_entries = parse.parse_reply(data)
+        self.assertEqual(len(url_entries), 3)
+
+        # header length patched to match, so only the body bounds checks can catch it
+        truncated = data[:2] + (len(data) - 5).to_bytes(3, 'big') + data[5:-5]
+        with self.assertRaises(parse.ParseError) as cm:
+            parse.parse_reply(truncated)
+        self.assertEqual(cm.exception.error_code, parse.PARSE_ERROR)
+
+        data = creator.create_registration(
+            service_type='service:test', scope_list='DEFAULT', attr_list='', lifetime=15, url='service:test://x'
+        )
+        garbage = data[:-8] + b'\xff' * 8
+        with self.assertRaises(parse.ParseError):
+            parse.parse_registration(garbage)
+
+    def test_srv_type_request(self):
+        header, msg = parse.parse_srv_type_request(creator.create_srv_type_request())
+        self.assertEqual(header['function_id'], 9)
+        self.assertDictEqual(msg, dict(naming_authority=None, scope_list='DEFAULT', pr_list=''))
+
+        _, msg = parse.parse_srv_type_request(creator.create_srv_type_request(naming_authority='', scope_list='test'))
+        self.assertDictEqual(msg, dict(naming_authority='', scope_list='test', pr_list=''))
+
+        _, msg = parse.parse_srv_type_request(creator.create_srv_type_request(pr_list='10.0.0.1,10.0.0.2'))
+        self.assertEqual('10.0.0.1,10.0.0.2', msg['pr_list'])
+        _, msg = parse.parse_request(creator.create_request(service_type='service:test', pr_list='10.0.0.1'))
+        self.assertEqual('10.0.0.1', msg['pr_list'])
+
+        data = creator.create_srv_type_reply(xid=5, service_types=['service:a', 'service:b.acme:x'])
+        header, error_code, service_types = parse.parse_srv_type_reply(data)
+        self.assertEqual(header['xid'], 5)
+        self.assertEqual(error_code, 0)
+        self.assertListEqual(service_types, ['service:a', 'service:b.acme:x'])
+        self.assertListEqual(parse.parse_srv_type_reply(creator.create_error_reply(9, 1, parse.PARSE_ERROR))[2], [])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import io
+import socket
+import struct
+import unittest
+
+from pyslp import creator, pcap
+
+
+def udp_frame(src, dst, data, sport=40000, dport=427):
+    udp = struct.pack('!HHHH', sport, dport, 8 + len(data), 0) + data
+    ip = struct.pack(
+        '!BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+        socket.inet_aton(src), socket.inet_aton(dst)
+    )
+    return b'\x00' * 12 + b'\x08\x00' + ip + udp
+
+
+def pcap_file(frames):
+    data = struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, pcap.LINKTYPE_ETHERNET)
+    for ts, frame in frames:
+        data += struct.pack('<IIII', int(ts), int(ts % 1 * 1e6), len(frame), len(frame)) + frame
+    return data
+
+
+def pcapng_block(block_type, body):
+    body += b'\x00' * (-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+
+def pcapng_file(frames):
+    data = pcapng_block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+    # if_tsresol of 10^-9 followed by opt_endofopt
+    data += pcapng_block(1, struct.pack('<HHI', pcap.LINKTYPE_ETHERNET, 0, 65535) +
+                         struct.pack('<HHB3x', 9, 1, 9) + struct.pack('<HH', 0, 0))
+    for ts, frame in frames:
+        ts = int(ts * 1e9)
+        data += pcapng_block(6, struct.pack('<IIIII', 0, ts >> 32, ts & 0xFFFFFFFF, len(frame), len(frame)) + frame)
+    return data
+
+
+class TestPcap(unittest.TestCase):
+
+    def setUp(self):
+        self.request = creator.create_request(service_type='service:seliverstov')
+        self.frames = [
+            (1.5, udp_frame('10.0.0.1', '239.255.255.253', self.request)),
+            (1.75, udp_frame('10.0.0.2', '10.0.0.1', creator.create_acknowledge(xid=1), sport=427, dport=40000)),
+            (2.0, udp_frame('10.0.0.1', '10.0.0.2', b'not slp', dport=53)),
+        ]
+
+    def assertPackets(self, packets):
+        self.assertEqual(2, len(packets))
+        self.assertAlmostEqual(1.5, packets[0].timestamp)
+        self.assertEqual(('10.0.0.1', 40000), packets[0].src)
+        self.assertEqual(('239.255.255.253', 427), packets[0].dst)
+        self.assertEqual(self.request, packets[0].data)
+        self.assertAlmostEqual(1.75, packets[1].timestamp)
+
+    def test_pcap(self):
+        self.assertPackets(list(pcap.read_packets(io.BytesIO(pcap_file(self.frames)))))
+
+    def test_pcapng(self):
+        self.assertPackets(list(pcap.read_packets(io.BytesIO(pcapng_file(self.frames)))))
+
+    def test_errors(self):
+        with self.assertRaises(pcap.PcapError):
+            list(pcap.read_packets(io.BytesIO(b'garbage!')))
+        with self.assertRaises(pcap.PcapError):
+            list(pcap.read_packets(io.BytesIO(pcap_file(self.frames)[:-10])))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pyslp.slpd import SLPDServer
+from pyslp import parse, creator
+from pyslp.registry import Registry, RegistryError
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_add_and_remove(self):
+        self.registry.add('service:test', 'service:test://a', lifetime=15)
+        self.registry.add('service:test', 'service:test://b')
+        self.assertEqual(2, len(self.registry))
+        self.assertSetEqual({'service:test://a', 'service:test://b'}, self.registry.services['service:test'])
+
+        self.registry.remove('service:test://a')
+        self.registry.remove('service:test://b')
+        self.assertIsNone(self.registry.remove('service:test://b'))
+        self.assertEqual(0, len(self.registry))
+        self.assertDictEqual({}, self.registry.services)
+
+    def test_refresh(self):
+        self.registry.add('service:test', 'service:test://a', lifetime=15, local_ts=0)
+        self.registry.add('service:test', 'service:test://a', lifetime=15, local_ts=10)
+        self.assertListEqual([], self.registry.expire(now=20))
+        self.assertEqual(25, self.registry.next_deadline())
+        self.assertEqual(1, len(self.registry.deadlines))
+
+    def test_change_service_type(self):
+        self.registry.add('service:test', 'service:test://a')
+        self.registry.add('service:other', 'service:test://a')
+        self.assertListEqual(['service:other'], list(self.registry.services))
+
+    def test_expire(self):
+        self.registry.add('service:test', 'service:test://a', lifetime=15, local_ts=0)
+        self.registry.add('service:test', 'service:test://b', local_ts=0)
+        self.assertEqual(15, self.registry.next_deadline())
+        self.assertListEqual([], self.registry.expire(now=10))
+        self.assertListEqual(['service:test://a'], self.registry.expire(now=16))
+        self.assertIsNone(self.registry.next_deadline())
+        self.assertListEqual([dict(url='service:test://b', lifetime=65535)], self.registry.lookup('service:test'))
+
+    def test_encoded_entries(self):
+        self.registry.add('service:test', 'service:test://a', lifetime=15, attr_list='(a=тест)')
+        self.registry.add('service:test', 'service:test://b', attr_list=b'(b=2)')
+        entry = self.registry.get('service:test://a')
+        self.assertEqual('(a=тест)'.encode(), entry['attrs'])
+        self.assertEqual('(a=тест)', entry['attr_list'])
+        self.assertEqual('(b=2)', self.registry.get('service:test://b')['attr_list'])
+        self.assertEqual(
+            creator.create_reply(xid=1, url_entries=self.registry.lookup('service:test')),
+            creator.create_encoded_reply(xid=1, url_entries=self.registry.encoded_url_entries('service:test'))
+        )
+
+    def test_service_types(self):
+        self.registry.add('service:printer:lpr', 'service:printer:lpr://a')
+        self.registry.add('service:printer.acme:lpr', 'service:printer.acme:lpr://b')
+        self.registry.add('service:scanner.acme', 'service:scanner.acme://c')
+        self.assertSetEqual(
+            {'service:printer:lpr', 'service:printer.acme:lpr', 'service:scanner.acme'},
+            set(self.registry.service_types())
+        )
+        self.assertListEqual(['service:printer:lpr'], self.registry.service_types(''))
+        self.assertSetEqual(
+            {'service:printer.acme:lpr', 'service:scanner.acme'}, set(self.registry.service_types('acme'))
+        )
+        self.registry.remove('service:scanner.acme://c')
+        self.assertListEqual(['service:printer.acme:lpr'], self.registry.service_types('acme'))
+        self.registry.remove('service:printer.acme:lpr://b')
+        self.assertNotIn('acme', self.registry.naming_authorities)
+
+
+class TestLimits(unittest.TestCase):
+
+    def test_max_entries_evicts_soonest_expiry(self):
+        registry = Registry(max_entries=3)
+        registry.add('service:test', 'service:test://a', lifetime=30, local_ts=0)
+        registry.add('service:test', 'service:test://b', lifetime=10, local_ts=0)
+        registry.add('service:test', 'service:test://c', local_ts=0)
+        registry.add('service:test', 'service:test://d', lifetime=20, local_ts=0)
+        self.assertSetEqual({'service:test://a', 'service:test://c', 'service:test://d'}, set(registry.url_entries))
+        self.assertEqual(1, registry.evictions)
+
+    def test_lru(self):
+        registry = Registry(max_entries=2, eviction='lru')
+        registry.add('service:test', 'service:test://a', lifetime=30, local_ts=0)
+        registry.add('service:test', 'service:test://b', lifetime=10, local_ts=1)
+        registry.add('service:test', 'service:test://a', lifetime=30, local_ts=2)
+        registry.add('service:test', 'service:test://c', lifetime=30, local_ts=3)
+        self.assertSetEqual({'service:test://a', 'service:test://c'}, set(registry.url_entries))
+
+    def test_per_source_and_type(self):
+        registry = Registry(max_entries_per_source=2, max_entries_per_type=3, eviction='lru')
+        for i in range(10):
+            registry.add('service:test', 'service:test://bad-{}'.format(i), local_ts=i, source='10.0.0.1')
+        registry.add('service:test', 'service:test://good', local_ts=10, source='10.0.0.2')
+        self.assertSetEqual(
+            {'service:test://bad-8', 'service:test://bad-9', 'service:test://good'}, set(registry.url_entries)
+        )
+        for i in range(3):
+            registry.add('service:other', 'service:other://{}'.format(i), local_ts=i)
+        registry.add('service:other', 'service:other://3', local_ts=3)
+        self.assertEqual(3, len(registry.services['service:other']))
+        self.assertNotIn('service:other://0', registry)
+
+    def test_reject(self):
+        registry = Registry(max_entries=1, max_attr_bytes=8, eviction=None)
+        with self.assertRaises(RegistryError) as cm:
+            registry.add('service:test', 'service:test://a', attr_list='(attr=value)')
+        self.assertEqual(parse.INVALID_REGISTRATION, cm.exception.error_code)
+        registry.add('service:test', 'service:test://a')
+        registry.add('service:test', 'service:test://a', attr_list='(a=1)')
+        with self.assertRaises(RegistryError):
+            registry.add('service:test', 'service:test://b')
+
+    def test_memory_accounting(self):
+        registry = Registry(max_bytes=100000)
+        for i in range(1000):
+            registry.add('service:test', 'service:test://{}'.format(i), attr_list='x' * 100, source='10.0.0.1')
+        self.assertLessEqual(registry.nbytes, 100000)
+        self.assertGreater(registry.evictions, 0)
+        self.assertEqual(len(registry), registry.usage()['entries'])
+        for url in list(registry.url_entries):
+            registry.remove(url)
+        self.assertEqual(0, registry.nbytes)
+        self.assertDictEqual({}, registry.sources)
+
+
+class TestBulkAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.slpd = SLPDServer()
+        self.interfaces = ['127.0.0.1', '127.0.0.2']
+        for interface in self.interfaces:
+            self.slpd.registry(interface)
+
+    def test_register_many(self):
+        registrations = [
+            dict(service_type='service:test', url='service:test://{}'.format(i), attr_list='(i={})'.format(i))
+            for i in range(1000)
+        ]
+        self.assertEqual(1000, self.slpd.register_many(registrations))
+        self.assertEqual(2000, len(list(self.slpd.iter_registrations())))
+        self.assertEqual(1000, len(self.slpd.lookup('service:test', interface='127.0.0.2')))
+
+        url_entries = self.slpd.lookup('service:test')
+        self.assertEqual(2000, len(url_entries))
+        self.assertSetEqual(set(self.interfaces), {entry['interface'] for entry in url_entries})
+
+        self.assertEqual(1000, self.slpd.deregister_many([r['url'] for r in registrations], '127.0.0.1'))
+        self.assertEqual(0, len(self.slpd.lookup('service:test', interface='127.0.0.1')))
+
+    def test_expire_now(self):
+        self.slpd.register_many([dict(service_type='service:test', url='service:test://a', lifetime=0)], '127.0.0.1')
+        self.assertEqual(1, self.slpd.expire_now())
+        self.assertListEqual([], list(self.slpd.iter_registrations()))
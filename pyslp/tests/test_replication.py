@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import json
+import asyncio
+import unittest
+
+from pyslp.slpd import create_slpd
+from pyslp.slptool import SLPClient
+from pyslp.loopback import LoopbackNetwork
+from pyslp.replication import Change, create_replicator
+
+
+class TestReplication(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.service_type = 'service:seliverstov'
+        self.ip_addrs = ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+        peers = [(ip_addr, 4280) for ip_addr in self.ip_addrs]
+        self.slpds = list()
+        self.replicators = list()
+        for ip_addr in self.ip_addrs:
+            slpd = self.loop.run_until_complete(create_slpd(ip_addr, network=self.network))
+            replicator = self.loop.run_until_complete(create_replicator(
+                slpd, ip_addr, 4280, [peer for peer in peers if peer[0] != ip_addr],
+                interval=0.05, network=self.network, max_datagram=512
+            ))
+            self.slpds.append(slpd)
+            self.replicators.append(replicator)
+
+    def tearDown(self):
+        for replicator in self.replicators:
+            replicator.close()
+        for slpd in self.slpds:
+            slpd.close()
+        self.loop.close()
+
+    def urls(self, slpd):
+        return {entry['url'] for entry in slpd.lookup(self.service_type)}
+
+    def test_change_stream(self):
+        slp_client = SLPClient(
+            ip_addrs='10.0.0.9', network=self.network, timeout=0.1, da_addrs={'10.0.0.9': '10.0.0.1'}
+        )
+        url = '{}://test.com'.format(self.service_type)
+        self.loop.run_until_complete(slp_client.register(service_type=self.service_type, url=url, lifetime=60))
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        for slpd in self.slpds:
+            self.assertSetEqual({url}, self.urls(slpd))
+            self.assertLessEqual(slpd.lookup(self.service_type)[0]['lifetime'], 60)
+
+        self.loop.run_until_complete(slp_client.deregister(url=url))
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        for slpd in self.slpds:
+            self.assertSetEqual(set(), self.urls(slpd))
+
+    def test_anti_entropy(self):
+        self.network.loss = 1
+        urls = ['{}://{}'.format(self.service_type, i) for i in range(50)]
+        self.slpds[0].register_many(dict(service_type=self.service_type, url=url) for url in urls)
+        self.slpds[1].register_many([dict(service_type=self.service_type, url=urls[0], attr_list='(newer)')])
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertSetEqual(set(), self.urls(self.slpds[2]))
+
+        self.network.loss = 0
+        self.loop.run_until_complete(asyncio.sleep(0.2))
+        for slpd in self.slpds:
+            self.assertSetEqual(set(urls), self.urls(slpd))
+            self.assertEqual('(newer)', slpd.registries[slpd.ip_addrs[0]].get(urls[0])['attr_list'])
+        vectors = [replicator.vector for replicator in self.replicators]
+        self.assertTrue(all(vector == vectors[0] for vector in vectors))
+
+    def test_non_peer_ignored(self):
+        change = Change('intruder', 1, 0, 'register', self.service_type, 'service:seliverstov://evil', None, '')
+        sent = list()
+
+        class Intruder(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                sent.append(data)
+
+        async def send(message):
+            transport = await self.network.create_unicast_listener(Intruder, '10.0.0.9', 4280)
+            transport.sendto(json.dumps(message).encode(), ('10.0.0.1', 4280))
+            await asyncio.sleep(0.01)
+            transport.close()
+
+        url = '{}://test.com'.format(self.service_type)
+        self.slpds[0].register_many([dict(service_type=self.service_type, url=url)])
+        self.loop.run_until_complete(send(dict(type='changes', changes=[change], ranges={'intruder': [0, 1]})))
+        self.loop.run_until_complete(send(dict(type='digest', vector={})))
+        for slpd in self.slpds:
+            self.assertSetEqual({url}, self.urls(slpd))
+        self.assertListEqual([], sent)
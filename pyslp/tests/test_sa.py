@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from pyslp import creator, parse
+from pyslp.sa import create_service_agent
+from pyslp.slpd import create_slpd
+from pyslp.loopback import LoopbackNetwork
+from pyslp.slptool import SLPClient, SLPClientError
+from pyslp.tests.test_loopback import Collector
+
+
+class TestServiceAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.service_type = 'service:seliverstov'
+        self.url = '{}://10.0.0.3:8080'.format(self.service_type)
+
+        self.service = SLPClient(ip_addrs='10.0.0.3', network=self.network, timeout=0.1)
+        self.service_agent = self.loop.run_until_complete(self.service.start_service_agent())
+        self.loop.run_until_complete(self.service.register(self.service_type, self.url, attr_list='(load=1)'))
+
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, timeout=0.1)
+
+    def tearDown(self):
+        self.slp_client.close()
+        self.service.close()
+        self.loop.close()
+
+    def send(self, data):
+        async def send():
+            receiver = Collector()
+            transport = await self.network.create_sender(lambda: receiver, '10.0.0.2', 0)
+            transport.sendto(data, ('239.255.255.253', 427))
+            await self.network.settle()
+            transport.close()
+            return [data for data, _ in receiver.received]
+        return self.loop.run_until_complete(send())
+
+    def test_find(self):
+        urls, _ = self.loop.run_until_complete(self.slp_client.findsrvs(self.service_type))
+        self.assertListEqual([self.url], urls[0])
+        self.assertEqual('(load=1)', self.loop.run_until_complete(self.slp_client.findattrs(self.url)))
+        service_types, _ = self.loop.run_until_complete(self.slp_client.findsrvtypes())
+        self.assertListEqual([self.service_type], service_types[0])
+
+        self.loop.run_until_complete(self.service.deregister(self.url))
+        # nothing to answer with, so the multicast request stays unanswered
+        with self.assertRaises(SLPClientError):
+            self.loop.run_until_complete(self.slp_client.findsrvs(self.service_type))
+
+    def test_pr_list(self):
+        request = creator.create_request(service_type=self.service_type)
+        multicast = request[:5] + bytes([request[5] | parse.FLAG_MCAST]) + request[6:]
+        self.assertEqual(1, len(self.send(multicast)))
+
+        request = creator.create_request(service_type=self.service_type, pr_list='10.0.0.1,10.0.0.3')
+        self.assertListEqual([], self.send(request))
+        self.assertEqual(1, self.service_agent.metrics.get('pyslp_slpd_previous_responder_total', interface='10.0.0.3'))
+
+    def test_registrations_stay_local(self):
+        with self.assertRaises(SLPClientError):
+            self.loop.run_until_complete(self.slp_client.register(self.service_type, 'service:seliverstov://other'))
+        self.assertEqual(1, len(self.service_agent.registry('10.0.0.3')))
+
+        self.loop.run_until_complete(self.service_agent.add_interface('10.0.0.4'))
+        self.assertIn(self.url, self.service_agent.registry('10.0.0.4'))
+
+
+class TestConvergence(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.network = LoopbackNetwork(latency=0.001)
+        self.ip_addrs = ['10.0.0.3', '10.0.0.4', '10.0.0.5']
+        self.service_agents = list()
+        for ip_addr in self.ip_addrs:
+            service_agent = self.loop.run_until_complete(create_service_agent(ip_addr, network=self.network))
+            service_agent.register(
+                'service:web', 'service:web://{}'.format(ip_addr), attr_list='(host={})'.format(ip_addr)
+            )
+            self.service_agents.append(service_agent)
+        # slpd answers even when it has nothing, which must not hide the SAs
+        self.slpd = self.loop.run_until_complete(create_slpd('10.0.0.1', network=self.network))
+        self.slp_client = SLPClient(ip_addrs='10.0.0.2', network=self.network, timeout=0.5, convergence_wait=0.05)
+
+    def tearDown(self):
+        for service_agent in self.service_agents:
+            service_agent.close()
+        self.slpd.close()
+        self.loop.close()
+
+    def test_findsrvs(self):
+        urls, _ = self.loop.run_until_complete(self.slp_client.findsrvs('service:web'))
+        self.assertSetEqual({'service:web://{}'.format(ip_addr) for ip_addr in self.ip_addrs}, set(urls[0]))
+        self.assertEqual(1, self.slp_client.metrics.get('pyslp_client_retransmissions_total', function='SrvRqst'))
+        for service_agent, ip_addr in zip(self.service_agents, self.ip_addrs):
+            self.assertEqual(1, service_agent.metrics.get('pyslp_slpd_previous_responder_total', interface=ip_addr))
+
+        service_types, _ = self.loop.run_until_complete(self.slp_client.findsrvtypes())
+        self.assertListEqual(['service:web'], service_types[0])
+        self.assertEqual(
+            '(host=10.0.0.4)', self.loop.run_until_complete(self.slp_client.findattrs('service:web://10.0.0.4'))
+        )
+
+    def test_set_pr_list(self):
+        request = creator.create_request(service_type='service:web', scope_list='test')
+        _, msg = parse.parse_request(creator.set_pr_list(request, '10.0.0.3,10.0.0.4'))
+        self.assertDictEqual(dict(service_type='service:web', scope_list='test', pr_list='10.0.0.3,10.0.0.4'), msg)
+        _, msg = parse.parse_srv_type_request(creator.set_pr_list(creator.create_srv_type_request(), '10.0.0.3'))
+        self.assertEqual('10.0.0.3', msg['pr_list'])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from collections import Counter
+
+from pyslp import parse, creator
+from pyslp.slpd import SLPDServer
+from pyslp.registry import Registry
+from pyslp.selection import (
+    RandomSelection, RoundRobinSelection, WeightedSelection, attribute_value
+)
+
+
+class TestSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+        self.urls = ['service:test://{}'.format(i) for i in range(10)]
+        for i, url in enumerate(self.urls):
+            self.registry.add('service:test', url, attr_list='(weight={}),(load={})'.format(i, 9 - i))
+
+    def test_service_lists(self):
+        self.registry.remove(self.urls[3])
+        self.registry.remove(self.urls[9])
+        urls = self.registry.service_lists['service:test']
+        self.assertSetEqual(self.registry.services['service:test'], set(urls))
+        for position, url in enumerate(urls):
+            self.assertEqual(position, self.registry.positions[url])
+
+    def test_attribute_value(self):
+        self.assertEqual(3.0, attribute_value('(a=1),(Weight = 3)', 'weight'))
+        self.assertEqual(1, attribute_value('(a=1)', 'weight', 1))
+        self.assertIsNone(attribute_value('(weight=heavy)', 'weight'))
+
+    def test_random(self):
+        selection = RandomSelection(seed=1)
+        urls = selection.select(self.registry, 'service:test', 3)
+        self.assertEqual(3, len(set(urls)))
+        self.assertTrue(set(urls) <= set(self.urls))
+        self.assertListEqual([], selection.select(self.registry, 'service:other', 3))
+
+    def test_round_robin(self):
+        selection = RoundRobinSelection()
+        seen = Counter()
+        for _ in range(5):
+            seen.update(selection.select(self.registry, 'service:test', 4))
+        self.assertSetEqual({2}, set(seen.values()))
+
+    def test_weighted(self):
+        selection = WeightedSelection(seed=1)
+        seen = Counter()
+        for _ in range(500):
+            urls = selection.select(self.registry, 'service:test', 2)
+            self.assertEqual(2, len(set(urls)))
+            seen.update(urls)
+        self.assertNotIn(self.urls[0], seen)
+        self.assertGreater(seen[self.urls[9]], seen[self.urls[1]])
+
+        # attribute changes invalidate the cached weights
+        self.registry.add('service:test', self.urls[0], attr_list='(weight=1000)')
+        self.assertIn(self.urls[0], selection.select(self.registry, 'service:test', 1))
+
+        selection = WeightedSelection('load', inverse=True, seed=1)
+        seen = Counter()
+        for _ in range(500):
+            seen.update(selection.select(self.registry, 'service:test', 1))
+        self.assertGreater(seen[self.urls[9]], seen[self.urls[1]])
+
+    def test_weighted_zero_weights_last(self):
+        registry = Registry()
+        for i, weight in enumerate([1000, 1, 1] + [0] * 20):
+            registry.add('service:test', 'service:test://{}'.format(i), attr_list='(weight={})'.format(weight))
+        positive = {'service:test://0', 'service:test://1', 'service:test://2'}
+        selection = WeightedSelection(seed=1)
+        for _ in range(1000):
+            self.assertSetEqual(positive, set(selection.select(registry, 'service:test', 3)))
+        urls = selection.select(registry, 'service:test', 5)
+        self.assertEqual(5, len(set(urls)))
+        self.assertSetEqual(positive, set(urls[:3]))
+
+
+class TestMaxResults(unittest.TestCase):
+
+    def test_handle_request(self):
+        slpd = SLPDServer(max_results=3, selection='round-robin')
+        slpd.registries['127.0.0.1'] = Registry()
+        slpd.register_many([
+            dict(service_type='service:test', url='service:test://{}'.format(i)) for i in range(10)
+        ])
+        request = creator.create_request(service_type='service:test')
+        seen = set()
+        for _ in range(4):
+            _, error_code, url_entries = parse.parse_reply(slpd.handle_request(request, '127.0.0.1'))
+            self.assertEqual(0, error_code)
+            self.assertEqual(3, len(url_entries))
+            seen.update(url_entry['url'] for url_entry in url_entries)
+        self.assertEqual(10, len(seen))
+        self.assertEqual(4, slpd.metrics.get('pyslp_slpd_limited_replies_total'))
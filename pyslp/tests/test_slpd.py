@@ -3,13 +3,24 @@
 import asyncio
 import unittest
 
-from pyslp.slpd import create_slpd
+from pyslp import creator
+from pyslp.slpd import SLPDServer, create_slpd
+from pyslp.registry import Registry
 from pyslp.slptool import SLPClient
 
 
 class TestSLPD(unittest.TestCase):
 
-    loop = asyncio.get_event_loop()
+    batch_size = None
+    pktinfo = False
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.close()
 
     def setUp(self):
         self.ip_addr = ['127.0.0.1', '127.0.0.2']
@@ -19,7 +30,9 @@ class TestSLPD(unittest.TestCase):
 
         self.event = asyncio.Event()
 
-        self.transport = self.loop.run_until_complete(create_slpd(ip_addrs=self.ip_addr))
+        self.transport = self.loop.run_until_complete(
+            create_slpd(ip_addrs=self.ip_addr, batch_size=self.batch_size, pktinfo=self.pktinfo)
+        )
         self.slp_client = SLPClient(ip_addrs=self.ip_addr)
 
     def tearDown(self):
@@ -74,3 +87,130 @@ class TestSLPD(unittest.TestCase):
             self.slp_client.findattrs(url=url)
         )
         self.assertEqual(attr_list, find_attr_list)
+
+    def test_metrics(self):
+        self.loop.run_until_complete(asyncio.sleep(1))
+        url = '{}://test.com'.format(self.service_type)
+        self.loop.run_until_complete(
+            self.slp_client.register(
+                service_type=self.service_type,
+                url=url
+            )
+        )
+        self.assertService(self.service_type, [url])
+        metrics = self.transport.metrics
+        self.assertGreaterEqual(metrics.get('pyslp_slpd_requests_total', function='SrvReg', interface='127.0.0.1'), 1)
+        self.assertGreaterEqual(metrics.get('pyslp_slpd_requests_total', function='SrvRqst', interface='127.0.0.1'), 1)
+        self.assertEqual(1, metrics.snapshot()['gauges'][
+            ('pyslp_slpd_registrations', (('interface', '127.0.0.1'),))
+        ])
+        self.assertEqual(1, self.slp_client.metrics.get(
+            'pyslp_client_requests_total', function='SrvRqst', interface='127.0.0.1'
+        ))
+
+
+class TestBatchSLPD(TestSLPD):
+
+    batch_size = 16
+
+
+class TestPktInfoSLPD(TestSLPD):
+
+    pktinfo = True
+
+
+class TestServiceTypeMetric(unittest.TestCase):
+
+    def test_unknown_types_share_a_series(self):
+        slpd = SLPDServer()
+        slpd.registries['127.0.0.1'] = Registry()
+        slpd.register_many([dict(service_type='service:test', url='service:test://test.com')])
+        for service_type in ['service:test'] + ['service:junk{}'.format(i) for i in range(100)]:
+            slpd.handle_request(creator.create_request(service_type=service_type), '127.0.0.1')
+        metrics = slpd.metrics
+        self.assertEqual(1, metrics.get('pyslp_slpd_service_type_requests_total', service_type='service:test'))
+        self.assertEqual(100, metrics.get('pyslp_slpd_service_type_requests_total', service_type='other'))
+        self.assertIsNone(metrics.get('pyslp_slpd_service_type_requests_total', service_type='service:junk0'))
+
+
+class TestDirectoryAgent(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.close()
+
+    def setUp(self):
+        self.ip_addr = ['127.0.0.1']
+        self.mcast_port = 4270
+        self.service_type = 'service:seliverstov'
+
+        self.slpd = self.loop.run_until_complete(
+            create_slpd(ip_addrs=self.ip_addr, mcast_port=self.mcast_port, da=True)
+        )
+        self.slp_client = SLPClient(ip_addrs=self.ip_addr, mcast_port=self.mcast_port)
+
+    def tearDown(self):
+        self.slpd.close()
+        self.loop.run_until_complete(asyncio.sleep(1))
+
+    def test_discover_and_unicast(self):
+        self.loop.run_until_complete(asyncio.sleep(1))
+        da_addrs = self.loop.run_until_complete(self.slp_client.discover_das(timeout=0.5))
+        self.assertDictEqual({'127.0.0.1': '127.0.0.1'}, da_addrs)
+
+        url = '{}://test.com'.format(self.service_type)
+        self.loop.run_until_complete(
+            self.slp_client.register(service_type=self.service_type, url=url)
+        )
+        find_urls = self.loop.run_until_complete(
+            self.slp_client.findsrvs(service_type=self.service_type)
+        )
+        self.assertListEqual([url], find_urls[0][0])
+        self.assertIn(url, self.slpd.registries['127.0.0.1'])
+
+
+class TestInterfaces(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.close()
+
+    def setUp(self):
+        self.mcast_port = 4273
+        self.slpd = self.loop.run_until_complete(
+            create_slpd(ip_addrs=['127.0.0.1'], mcast_port=self.mcast_port)
+        )
+        self.slp_client = SLPClient(ip_addrs=['127.0.0.1'], mcast_port=self.mcast_port)
+
+    def tearDown(self):
+        self.slpd.close()
+
+    def test_add_and_remove_interface(self):
+        self.loop.run_until_complete(self.slpd.add_interface('127.0.0.2'))
+        self.assertListEqual(['127.0.0.1', '127.0.0.2'], self.slpd.ip_addrs)
+        self.assertEqual(1, len(self.slpd.listeners['127.0.0.2']))
+
+        self.loop.run_until_complete(self.slpd.remove_interface('127.0.0.1'))
+        self.assertListEqual(['127.0.0.2'], self.slpd.ip_addrs)
+        self.assertNotIn('127.0.0.1', self.slpd.registries)
+        self.assertNotIn('127.0.0.1', self.slpd.listeners)
+        self.assertEqual(1, len(self.slpd.transports))
+
+    def test_expiry_timer(self):
+        url = 'service:seliverstov://test.com'
+        self.loop.run_until_complete(
+            self.slp_client.register(service_type='service:seliverstov', url=url, lifetime=1)
+        )
+        self.assertIn(url, self.slpd.registries['127.0.0.1'])
+        self.assertIsNotNone(self.slpd.expiry_handle)
+        self.loop.run_until_complete(asyncio.sleep(1.2))
+        self.assertNotIn(url, self.slpd.registries['127.0.0.1'])
+        self.assertIsNone(self.slpd.expiry_handle)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from pyslp.slpd import create_slpd
+from pyslp.slptool import SyncSLPClient
+
+
+class TestSyncSLPClient(unittest.TestCase):
+
+    port = 4277
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.slpd = asyncio.run_coroutine_threadsafe(
+            create_slpd('127.0.0.1', mcast_port=cls.port), cls.loop
+        ).result()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.slpd.close)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def setUp(self):
+        self.service_type = 'service:seliverstov'
+        self.slp_client = SyncSLPClient('127.0.0.1', mcast_port=self.port, timeout=5)
+
+    def tearDown(self):
+        self.slp_client.close()
+
+    def test_blocking_calls(self):
+        url = '{}://test.com'.format(self.service_type)
+        self.slp_client.register(self.service_type, url, attr_list='(attr=value)')
+        self.assertListEqual([url], self.slp_client.findsrvs(self.service_type)[0][0])
+        self.assertEqual('(attr=value)', self.slp_client.findattrs(url))
+        self.assertListEqual([self.service_type], self.slp_client.findsrvtypes()[0][0])
+        self.slp_client.deregister(url)
+        self.assertListEqual([], self.slp_client.findsrvs(self.service_type)[0][0])
+
+    def test_thread_pool(self):
+        urls = ['{}://test_{}.com'.format(self.service_type, i) for i in range(20)]
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda url: self.slp_client.register(self.service_type, url), urls))
+            results = list(pool.map(lambda _: self.slp_client.findsrvs(self.service_type), range(20)))
+        for url_entries, _ in results:
+            self.assertSetEqual(set(urls), set(url_entries[0]))
+
+        futures = [self.slp_client.deregister_future(url) for url in urls]
+        for future in futures:
+            future.result(5)
+        self.assertListEqual([], self.slp_client.findsrvs(self.service_type)[0][0])
+        self.assertEqual(1, len(self.slp_client.client.dispatchers))
+
+    def test_timeout_cancels_request(self):
+        # nobody listens on this port, so the request would wait for the client timeout of 1s
+        with SyncSLPClient('127.0.0.1', mcast_port=self.port + 1, timeout=0.1) as slp_client:
+            with self.assertRaises(TimeoutError):
+                slp_client.findsrvs(self.service_type)
+            time.sleep(0.1)
+            dispatcher = slp_client.client.dispatchers['127.0.0.1'].result()
+            self.assertDictEqual({}, dispatcher.receivers)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pyslp import creator
+from pyslp.slpd import SLPDServer
+from pyslp.trace import Hook, SamplingHook
+
+
+class RecordingHook(Hook):
+
+    def __init__(self):
+        self.stages = list()
+
+    def __call__(self, stage, timestamp, info):
+        self.stages.append((stage, info.get('function')))
+
+
+class RecordingTransport:
+
+    def __init__(self):
+        self.sent = list()
+
+    def sendto(self, data, addr):
+        self.sent.append((data, addr))
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.interface = '127.0.0.1'
+        self.hook = RecordingHook()
+        self.slpd = SLPDServer(hook=self.hook)
+        self.slpd.registry(self.interface)
+        self.transport = RecordingTransport()
+
+    def test_server_stages(self):
+        data = creator.create_registration(
+            service_type='service:test',
+            scope_list='DEFAULT',
+            attr_list='',
+            lifetime=15,
+            url='service:test://test.com'
+        )
+        self.slpd.datagram_received(data, ('127.0.0.1', 1000), self.interface, self.transport)
+        self.assertEqual(1, len(self.transport.sent))
+        self.assertListEqual(
+            [
+                ('receive', None),
+                ('header', 'SrvReg'),
+                ('body', 'SrvReg'),
+                ('lookup', 'SrvReg'),
+                ('encode', 'SrvReg'),
+                ('send', 'SrvReg')
+            ],
+            self.hook.stages
+        )
+
+    def test_sampling_hook(self):
+        hook = SamplingHook(rate=2)
+        for i in range(4):
+            info = dict(function='SrvRqst')
+            hook('receive', 0.0, info)
+            hook('header', 1.0, info)
+            hook('body', 3.0, info)
+        report = hook.report()
+        self.assertEqual(2, report[('SrvRqst', 'header')]['count'])
+        self.assertEqual(1.0, report[('SrvRqst', 'header')]['mean'])
+        self.assertEqual(2.0, report[('SrvRqst', 'body')]['max'])
+        hook.reset()
+        self.assertDictEqual({}, hook.report())
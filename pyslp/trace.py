@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+STAGES = ('receive', 'header', 'body', 'lookup', 'encode', 'send')
+
+
+class Hook:
+
+    def __call__(self, stage, timestamp, info):
+        pass
+
+
+class SamplingHook(Hook):
+
+    def __init__(self, rate=1):
+        self.rate = rate
+        self.counter = 0
+        self.stats = dict()
+
+    def __call__(self, stage, timestamp, info):
+        previous = info.get('_sample_ts')
+        if previous is None:
+            if '_sample_skip' in info:
+                return
+            self.counter += 1
+            if self.counter % self.rate:
+                info['_sample_skip'] = True
+            else:
+                info['_sample_ts'] = timestamp
+            return
+        info['_sample_ts'] = timestamp
+
+        key = info.get('function'), stage
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = [0, 0.0, 0.0]
+        delta = timestamp - previous
+        stat[0] += 1
+        stat[1] += delta
+        if delta > stat[2]:
+            stat[2] = delta
+
+    def report(self):
+        return {
+            key: dict(
+                count=count,
+                total=total,
+                mean=total / count,
+                max=maximum
+            )
+            for key, (count, total, maximum) in self.stats.items()
+        }
+
+    def reset(self):
+        self.counter = 0
+        self.stats = dict()
@@ -9,6 +9,16 @@ setup(
     author='Seliverstov Maksim',
     author_email='Maksim.V.Seliverstov@yandex.ru',
     packages=find_packages(),
+    python_requires='>=3.7',
+    extras_require={
+        'uvloop': ['uvloop']
+    },
+    entry_points={
+        'console_scripts': [
+            'pyslp-slpd=pyslp.cli:slpd_main',
+            'pyslp-tool=pyslp.cli:tool_main'
+        ]
+    },
     zip_safe=False,
     keywords=['slp', 'openslp', 'slptool', 'slpd', 'service location protocol']
 )